@@ -0,0 +1,16 @@
+-- =============================================
+-- WORKER ID CHO ID SINH RA (ORD..., REV..., INV...)
+-- =============================================
+-- ID dạng Snowflake chỉ duy nhất khi không có hai process đang chạy dùng chung
+-- worker id (10 bit), kể cả trên các máy/container khác nhau. Mỗi process
+-- (app/utils/helpers.py, app/services/id_leases.py) thuê một worker id trong bảng
+-- này lúc khởi động, gia hạn định kỳ và trả lại khi tắt; lease của process bị
+-- crash được dùng lại sau ID_WORKER_LEASE_TTL giây.
+
+USE furniture_db;
+
+CREATE TABLE IF NOT EXISTS id_worker_leases (
+    worker_id INT PRIMARY KEY,
+    owner VARCHAR(100) NOT NULL,
+    expires_at DATETIME NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
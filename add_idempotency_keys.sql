@@ -0,0 +1,23 @@
+-- =============================================
+-- IDEMPOTENCY-KEY CHO POST /orders, /cart, /inventory/transactions
+-- =============================================
+-- Key được INSERT trong cùng transaction với đơn hàng/giỏ hàng/giao dịch kho
+-- (app/services/idempotency.py), nên request retry tới worker khác hoặc sau khi
+-- restart/deploy vẫn nhận lại response cũ thay vì tạo bản ghi trùng.
+-- Key hết hạn sau IDEMPOTENCY_TTL và được xóa định kỳ.
+
+USE furniture_db;
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    namespace VARCHAR(50) NOT NULL,
+    user_id VARCHAR(50) NOT NULL,
+    idempotency_key VARCHAR(255) NOT NULL,
+    fingerprint VARCHAR(64) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'in_progress',
+    status_code INT NULL,
+    response_body BLOB NULL,
+    created_at DATETIME NOT NULL,
+    expires_at DATETIME NOT NULL,
+    PRIMARY KEY (namespace, user_id, idempotency_key),
+    INDEX ix_idempotency_keys_expires_at (expires_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
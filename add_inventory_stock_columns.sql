@@ -0,0 +1,17 @@
+-- =============================================
+-- CỘT TỒN KHO KHẢ DỤNG (GENERATED COLUMN) CHO CẢNH BÁO HẾT HÀNG
+-- =============================================
+-- quantity_available = quantity_on_hand - quantity_reserved
+-- stock_margin       = quantity_available - reorder_level (<= 0: cần nhập hàng)
+-- Hai cột STORED do MySQL tự tính khi ghi, có index riêng, nên
+-- GET /api/reports/low-stock và GET /api/inventory?low_stock_only=true
+-- chỉ đọc các dòng cần cảnh báo, sắp xếp ngay trong database.
+
+USE furniture_db;
+
+ALTER TABLE inventory
+    ADD COLUMN quantity_available INT AS (quantity_on_hand - quantity_reserved) STORED,
+    ADD COLUMN stock_margin INT AS (quantity_on_hand - quantity_reserved - reorder_level) STORED;
+
+CREATE INDEX ix_inventory_stock_margin ON inventory (stock_margin);
+CREATE INDEX ix_inventory_quantity_available ON inventory (quantity_available);
@@ -0,0 +1,10 @@
+-- =============================================
+-- INDEX CHO LỊCH SỬ ĐƠN HÀNG - GET /api/orders
+-- =============================================
+-- Đơn hàng của một user được đọc theo thứ tự date_order giảm dần, phân trang
+-- bằng cursor (header X-Next-Cursor). Items của cả trang được nạp bằng một
+-- truy vấn IN trên order_items.order_id (đã có index idx_order).
+
+USE furniture_db;
+
+CREATE INDEX ix_orders_user_date_order_id ON orders (user_id, date_order, id);
@@ -0,0 +1,21 @@
+-- =============================================
+-- INDEX CHO BÁO CÁO HÓA ĐƠN - GET /api/reports/orders
+-- =============================================
+-- (date_order, id): lọc theo khoảng ngày và phân trang bằng cursor (X-Next-Cursor).
+-- FULLTEXT ngram trên full_name: tìm tên khách hàng theo chuỗi con
+-- (kể cả tiếng Việt) mà không phải quét toàn bảng như LIKE '%...%'.
+--
+-- Stopword: danh sách stopword mặc định của InnoDB có các chữ cái đơn ("a", "i", ...)
+-- và parser ngram bỏ mọi n-gram chứa stopword, nên "Lan" ("la", "an") không còn
+-- khớp. Index này phải được tạo với một bảng stopword rỗng (biến session
+-- innodb_ft_user_stopword_table, được lưu cùng index khi tạo). Nếu index đã được
+-- tạo trước đó với stopword mặc định, DROP INDEX rồi chạy lại phần dưới.
+-- (Hoặc đặt innodb_ft_enable_stopword=OFF trong my.cnf trước khi tạo index.)
+
+USE furniture_db;
+
+CREATE INDEX ix_orders_date_order_id ON orders (date_order, id);
+
+CREATE TABLE IF NOT EXISTS ft_empty_stopwords (value VARCHAR(30)) ENGINE=InnoDB;
+SET SESSION innodb_ft_user_stopword_table = 'furniture_db/ft_empty_stopwords';
+CREATE FULLTEXT INDEX ft_orders_full_name ON orders (full_name) WITH PARSER ngram;
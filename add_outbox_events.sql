@@ -0,0 +1,22 @@
+-- =============================================
+-- OUTBOX CHO BACKGROUND JOBS
+-- =============================================
+-- create_order chỉ ghi đơn hàng + một dòng outbox_events rồi trả về ngay;
+-- worker nền (app/services/jobs.py) lấy các event theo lô bằng
+-- SELECT ... FOR UPDATE SKIP LOCKED (cần MySQL 8.0+) và cập nhật
+-- sell_count, ... trong cùng transaction với việc đánh dấu processed.
+
+USE furniture_db;
+
+CREATE TABLE IF NOT EXISTS outbox_events (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    event_type VARCHAR(50) NOT NULL,
+    payload JSON NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    last_error TEXT NULL,
+    created_at DATETIME NOT NULL,
+    available_at DATETIME NOT NULL,
+    processed_at DATETIME NULL,
+    INDEX ix_outbox_events_status_available_id (status, available_at, id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
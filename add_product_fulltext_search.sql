@@ -0,0 +1,10 @@
+-- =============================================
+-- FULLTEXT INDEX CHO TÌM KIẾM SẢN PHẨM
+-- =============================================
+-- Thay cho LIKE '%name%' (full table scan) trong GET /api/products?name=...
+-- ft_products_name dùng để ưu tiên kết quả khớp theo tên sản phẩm.
+
+USE furniture_db;
+
+ALTER TABLE products ADD FULLTEXT INDEX ft_products_name (name);
+ALTER TABLE products ADD FULLTEXT INDEX ft_products_search (name, title, description);
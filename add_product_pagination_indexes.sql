@@ -0,0 +1,13 @@
+-- =============================================
+-- INDEX CHO KEYSET PAGINATION - GET /api/products
+-- =============================================
+-- Mỗi cột sort_by có một index (status, cột, id) để trang 10.000
+-- cũng chỉ đọc `limit` dòng như trang 1.
+
+USE furniture_db;
+
+CREATE INDEX ix_products_status_timestamp_id ON products (status, timestamp, id);
+CREATE INDEX ix_products_status_current_price_id ON products (status, current_price, id);
+CREATE INDEX ix_products_status_sell_count_id ON products (status, sell_count, id);
+CREATE INDEX ix_products_status_review_avg_id ON products (status, review_avg, id);
+CREATE INDEX ix_products_status_name_id ON products (status, name, id);
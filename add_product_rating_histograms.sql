@@ -0,0 +1,37 @@
+-- =============================================
+-- HISTOGRAM SỐ SAO THEO SẢN PHẨM
+-- =============================================
+-- Mỗi sản phẩm có một dòng đếm số review 1★..5★ (rating làm tròn, giới hạn 1-5),
+-- cập nhật trong cùng transaction với mỗi lần tạo, sửa, xóa review.
+-- Trang chi tiết sản phẩm chỉ cần đọc một dòng theo khóa chính.
+-- Sau khi chạy có thể kiểm tra bằng: python manage.py review-stats check
+
+USE furniture_db;
+
+CREATE TABLE IF NOT EXISTS product_rating_histograms (
+    product_id VARCHAR(50) NOT NULL PRIMARY KEY,
+    star_1 INT NOT NULL DEFAULT 0,
+    star_2 INT NOT NULL DEFAULT 0,
+    star_3 INT NOT NULL DEFAULT 0,
+    star_4 INT NOT NULL DEFAULT 0,
+    star_5 INT NOT NULL DEFAULT 0,
+    CONSTRAINT fk_rating_histograms_product FOREIGN KEY (product_id)
+        REFERENCES products(id) ON DELETE CASCADE
+);
+
+-- Backfill (tương đương: python manage.py review-stats backfill)
+INSERT INTO product_rating_histograms (product_id, star_1, star_2, star_3, star_4, star_5)
+SELECT
+    product_id,
+    SUM(rating < 1.5),
+    SUM(rating >= 1.5 AND rating < 2.5),
+    SUM(rating >= 2.5 AND rating < 3.5),
+    SUM(rating >= 3.5 AND rating < 4.5),
+    SUM(rating >= 4.5)
+FROM reviews
+GROUP BY product_id
+ON DUPLICATE KEY UPDATE
+    star_1 = VALUES(star_1), star_2 = VALUES(star_2), star_3 = VALUES(star_3),
+    star_4 = VALUES(star_4), star_5 = VALUES(star_5);
+
+SELECT COUNT(*) AS products_with_histogram FROM product_rating_histograms;
@@ -0,0 +1,25 @@
+-- =============================================
+-- REVIEW AGGREGATES TRÊN BẢNG PRODUCTS
+-- =============================================
+-- review_count / rating_sum được cập nhật nguyên tử mỗi lần tạo, sửa, xóa
+-- review; review_avg = rating_sum / review_count.
+-- Sau khi chạy có thể kiểm tra bằng: python manage.py review-stats check
+
+USE furniture_db;
+
+ALTER TABLE products
+    ADD COLUMN review_count INT NOT NULL DEFAULT 0,
+    ADD COLUMN rating_sum DOUBLE NOT NULL DEFAULT 0;
+
+-- Backfill (tương đương: python manage.py review-stats backfill)
+UPDATE products p
+LEFT JOIN (
+    SELECT product_id, COUNT(*) AS cnt, SUM(rating) AS total
+    FROM reviews
+    GROUP BY product_id
+) r ON r.product_id = p.id
+SET p.review_count = COALESCE(r.cnt, 0),
+    p.rating_sum = COALESCE(r.total, 0);
+
+UPDATE products
+SET review_avg = CASE WHEN review_count > 0 THEN rating_sum / review_count ELSE 0 END;
@@ -0,0 +1,12 @@
+-- =============================================
+-- INDEX CHO KEYSET PAGINATION - REVIEWS
+-- =============================================
+-- GET /api/products/{id}/reviews (sort_by=timestamp|rating) và
+-- GET /api/users/me/reviews đọc thẳng theo index, không cần filesort,
+-- nên trang sâu cũng nhanh như trang đầu (dùng header X-Next-Cursor).
+
+USE furniture_db;
+
+CREATE INDEX ix_reviews_product_timestamp_id ON reviews (product_id, timestamp, id);
+CREATE INDEX ix_reviews_product_rating_id ON reviews (product_id, rating, id);
+CREATE INDEX ix_reviews_user_timestamp_id ON reviews (user_id, timestamp, id);
@@ -0,0 +1,25 @@
+-- =============================================
+-- BẢNG TỔNG HỢP DOANH THU THEO NGÀY
+-- =============================================
+-- GET /api/reports/revenue và /api/reports/top-products đọc từ các bảng này
+-- thay vì quét orders/order_items. Worker nền cộng đơn mới và trừ đơn bị hủy
+-- (đơn đã hủy không được tính).
+-- Sau khi tạo bảng, nạp dữ liệu cũ bằng: python manage.py sales-rollup rebuild
+
+USE furniture_db;
+
+CREATE TABLE IF NOT EXISTS sales_daily_rollup (
+    day DATE NOT NULL PRIMARY KEY,
+    order_count INT NOT NULL DEFAULT 0,
+    revenue DOUBLE NOT NULL DEFAULT 0,
+    units_sold INT NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS sales_daily_product_rollup (
+    day DATE NOT NULL,
+    product_id VARCHAR(50) NOT NULL,
+    units_sold INT NOT NULL DEFAULT 0,
+    revenue DOUBLE NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, product_id),
+    INDEX ix_sales_daily_product_rollup_product_id (product_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,15 @@
+-- =============================================
+-- GIỮ HÀNG (RESERVATION) KHI ĐẶT ĐƠN
+-- =============================================
+-- Khi đặt đơn, số lượng được chuyển vào inventory.quantity_reserved bằng
+-- UPDATE có điều kiện (quantity_on_hand - quantity_reserved >= số lượng),
+-- nên hai đơn đồng thời không thể bán cùng một sản phẩm cuối cùng.
+-- order_items.reserved_quantity ghi lại số lượng mỗi dòng đang giữ:
+--   - hủy đơn      -> trả lại quantity_reserved
+--   - giao thành công -> trừ quantity_on_hand + ghi phiếu export_stock
+-- Đơn cũ (trước migration) có reserved_quantity = 0 nên không bị ảnh hưởng.
+
+USE furniture_db;
+
+ALTER TABLE order_items
+    ADD COLUMN reserved_quantity INT NOT NULL DEFAULT 0;
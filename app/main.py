@@ -1,8 +1,12 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from .config import settings
+from .database import async_engine
+from .services.jobs import worker_pool
+from .utils.helpers import reserve_worker_id, release_worker_id
 from .routers import (
     auth, users, products, categories, banners, cart, favorites, orders, 
-    countries, filters, reviews, inventory, suppliers, reports
+    countries, filters, reviews, inventory, suppliers, reports, metrics
 )
 
 app = FastAPI(
@@ -18,6 +22,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # Include routers
@@ -35,6 +40,33 @@ app.include_router(reviews.router, prefix="/api")
 app.include_router(inventory.router, prefix="/api")
 app.include_router(suppliers.router, prefix="/api")
 app.include_router(reports.router, prefix="/api")
+app.include_router(metrics.router, prefix="/api")
+
+
+@app.on_event("startup")
+def lease_id_worker_id():
+    # Fail here, not on the first order, if no worker id can be leased
+    reserve_worker_id()
+
+
+@app.on_event("startup")
+def start_job_workers():
+    worker_pool.start(settings.JOB_WORKERS)
+
+
+@app.on_event("shutdown")
+def stop_job_workers():
+    worker_pool.stop()
+
+
+@app.on_event("shutdown")
+def free_id_worker_id():
+    release_worker_id()
+
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    await async_engine.dispose()
 
 
 @app.get("/")
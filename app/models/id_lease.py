@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from ..database import Base
+
+
+class IdWorkerLease(Base):
+    """
+    Worker id (0-1023) held by one running process for the ids it generates
+    (utils.helpers); leased and renewed by services.id_leases
+    """
+    __tablename__ = "id_worker_leases"
+
+    worker_id = Column(Integer, primary_key=True, autoincrement=False)
+    owner = Column(String(100), nullable=False)         # host:pid:random of the holder
+    expires_at = Column(DateTime, nullable=False)       # Free for another process after this (UTC)
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, String, DateTime, LargeBinary, Index
+from datetime import datetime
+from ..database import Base
+import enum
+
+
+class IdempotencyStatus(str, enum.Enum):
+    in_progress = "in_progress"   # Claimed; committed only together with the route's own writes
+    completed = "completed"       # The stored response is replayed
+
+
+class IdempotencyKey(Base):
+    """Idempotency-Key of a POST (services.idempotency), shared by all worker processes"""
+    __tablename__ = "idempotency_keys"
+
+    namespace = Column(String(50), primary_key=True)
+    user_id = Column(String(50), primary_key=True)             # "" for anonymous requests
+    idempotency_key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)            # Hash of the request body
+    status = Column(String(20), nullable=False, default=IdempotencyStatus.in_progress.value)
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+
+    # Expired keys are purged in expiry order
+    __table_args__ = (
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey, Enum, Computed, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from ..database import Base
@@ -21,6 +21,9 @@ class Inventory(Base):
     quantity_reserved = Column(Integer, default=0)  # Số lượng đã đặt nhưng chưa xuất
     reorder_level = Column(Integer, default=10)     # Mức cảnh báo hết hàng
     reorder_quantity = Column(Integer, default=50)  # Số lượng đề xuất nhập
+    # Stored generated columns (computed by the database) so stock alerts filter and sort on an index
+    quantity_available = Column(Integer, Computed("quantity_on_hand - quantity_reserved", persisted=True))
+    stock_margin = Column(Integer, Computed("quantity_on_hand - quantity_reserved - reorder_level", persisted=True))  # <= 0: cần nhập hàng
     last_restock_date = Column(DateTime, nullable=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -28,6 +31,12 @@ class Inventory(Base):
     product = relationship("Product", backref="inventory")
     transactions = relationship("InventoryTransaction", back_populates="inventory", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Low-stock alerts (stock_margin <= 0) and out-of-stock (quantity_available <= 0)
+        Index("ix_inventory_stock_margin", "stock_margin"),
+        Index("ix_inventory_quantity_available", "quantity_available"),
+    )
+
 
 class InventoryTransaction(Base):
     __tablename__ = "inventory_transactions"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum, Text
+from sqlalchemy import DDL, Column, Index, Integer, String, Float, DateTime, ForeignKey, Enum, Text, event
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from ..database import Base
@@ -43,18 +43,43 @@ class Order(Base):
     user = relationship("User", back_populates="orders")
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Order history (GET /orders): one user's orders newest first, keyset paginated
+        Index("ix_orders_user_date_order_id", "user_id", "date_order", "id"),
+        # Admin order reports and exports: date ranges, keyset paginated
+        Index("ix_orders_date_order_id", "date_order", "id"),
+        # Customer name search in reports (MySQL only, see services.reports.customer_name_filter);
+        # built with an empty stopword table, see the DDL events below and add_order_report_indexes.sql
+        Index("ft_orders_full_name", "full_name", mysql_prefix="FULLTEXT", mysql_with_parser="ngram").ddl_if(dialect="mysql"),
+    )
+
+
+# InnoDB's default stopwords drop every ngram containing one ("Lan" -> "la",
+# "an"), so create_all builds ft_orders_full_name, on the connection that
+# creates the table, with an empty stopword table and then restores the default
+event.listen(Order.__table__, "before_create", DDL(
+    "CREATE TABLE IF NOT EXISTS ft_empty_stopwords (value VARCHAR(30)) ENGINE=InnoDB"
+).execute_if(dialect="mysql"))
+event.listen(Order.__table__, "before_create", DDL(
+    "SET SESSION innodb_ft_user_stopword_table = CONCAT(DATABASE(), '/ft_empty_stopwords')"
+).execute_if(dialect="mysql"))
+event.listen(Order.__table__, "after_create", DDL(
+    "SET SESSION innodb_ft_user_stopword_table = DEFAULT"
+).execute_if(dialect="mysql"))
+
 
 class OrderItem(Base):
     __tablename__ = "order_items"
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    order_id = Column(String(50), ForeignKey("orders.id"), nullable=False)
+    order_id = Column(String(50), ForeignKey("orders.id"), nullable=False, index=True)
     product_id = Column(String(50), nullable=False)
     name = Column(String(255), nullable=False)
     img = Column(String(500), nullable=True)
     color = Column(String(50), nullable=True)
     quantity = Column(Integer, nullable=False)
     price = Column(Float, nullable=False)
+    reserved_quantity = Column(Integer, nullable=False, default=0)  # Stock still reserved for this line (services.inventory)
 
     # Relationships
     order = relationship("Order", back_populates="items")
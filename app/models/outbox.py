@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Text, Index
+from datetime import datetime
+from ..database import Base
+import enum
+
+
+class OutboxStatus(str, enum.Enum):
+    pending = "pending"
+    processed = "processed"
+    failed = "failed"      # Gave up after JOB_MAX_ATTEMPTS
+
+
+class OutboxEvent(Base):
+    """
+    Side effect to run after a commit (services.jobs). Written in the same
+    transaction as the change that causes it, so it is never lost or run
+    for a rolled back change.
+    """
+    __tablename__ = "outbox_events"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    event_type = Column(String(50), nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(String(20), nullable=False, default=OutboxStatus.pending.value)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    available_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # Not retried before this
+    processed_at = Column(DateTime, nullable=True)
+
+    # Workers claim the oldest due pending events
+    __table_args__ = (
+        Index("ix_outbox_events_status_available_id", "status", "available_at", "id"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, Float, DateTime, ForeignKey, JSON, Enum
+from sqlalchemy import Column, Integer, String, Text, Float, DateTime, ForeignKey, JSON, Enum, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from ..database import Base
@@ -26,6 +26,8 @@ class Product(Base):
     root_price = Column(Float, default=0)
     current_price = Column(Float, default=0)
     review_avg = Column(Float, default=0)
+    review_count = Column(Integer, nullable=False, default=0)  # Maintained by app.services.reviews
+    rating_sum = Column(Float, nullable=False, default=0)
     sell_count = Column(Float, default=0)
     timestamp = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
@@ -36,6 +38,18 @@ class Product(Base):
     # ✅ QUAN TRỌNG: Thêm lazy="noload" để KHÔNG tự động load reviews
     reviews = relationship("Review", back_populates="product", lazy="noload")
 
+    # Composite indexes backing keyset pagination of GET /products
+    __table_args__ = (
+        Index("ix_products_status_timestamp_id", "status", "timestamp", "id"),
+        Index("ix_products_status_current_price_id", "status", "current_price", "id"),
+        Index("ix_products_status_sell_count_id", "status", "sell_count", "id"),
+        Index("ix_products_status_review_avg_id", "status", "review_avg", "id"),
+        Index("ix_products_status_name_id", "status", "name", "id"),
+        # FULLTEXT indexes used by app.services.search (MySQL only)
+        Index("ft_products_name", "name", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+        Index("ft_products_search", "name", "title", "description", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+    )
+
 
 class ProductItem(Base):
     __tablename__ = "product_items"
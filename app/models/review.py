@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Index, Integer, String, Float, DateTime, ForeignKey, Text
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from ..database import Base
@@ -16,4 +16,23 @@ class Review(Base):
 
     # Relationships
     user = relationship("User", back_populates="reviews")
-    product = relationship("Product", back_populates="reviews")
\ No newline at end of file
+    product = relationship("Product", back_populates="reviews")
+
+    # Keyset pagination of one product's / one user's reviews (see services.reviews.paginate_reviews)
+    __table_args__ = (
+        Index("ix_reviews_product_timestamp_id", "product_id", "timestamp", "id"),
+        Index("ix_reviews_product_rating_id", "product_id", "rating", "id"),
+        Index("ix_reviews_user_timestamp_id", "user_id", "timestamp", "id"),
+    )
+
+
+class ProductRatingHistogram(Base):
+    """Number of reviews per star (rating rounded to 1-5), updated with every review write"""
+    __tablename__ = "product_rating_histograms"
+
+    product_id = Column(String(50), ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    star_1 = Column(Integer, nullable=False, default=0)
+    star_2 = Column(Integer, nullable=False, default=0)
+    star_3 = Column(Integer, nullable=False, default=0)
+    star_4 = Column(Integer, nullable=False, default=0)
+    star_5 = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, Float, Date
+from ..database import Base
+
+
+class SalesDailyRollup(Base):
+    """Sales of one day (UTC), excluding cancelled orders; maintained by services.sales"""
+    __tablename__ = "sales_daily_rollup"
+
+    day = Column(Date, primary_key=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)      # Sum of orders.total_order
+    units_sold = Column(Integer, nullable=False, default=0)
+
+
+class SalesDailyProductRollup(Base):
+    """Units and line revenue per product and day, excluding cancelled orders"""
+    __tablename__ = "sales_daily_product_rollup"
+
+    day = Column(Date, primary_key=True)
+    product_id = Column(String(50), primary_key=True, index=True)
+    units_sold = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)      # Sum of quantity * price
@@ -1,24 +1,29 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from ..database import get_db
+from ..database import get_async_db
 from ..schemas.banner import BannerResponse
 from ..models.banner import Banner
+from ..services.cache import cached, invalidate_on
 
 router = APIRouter(prefix="/banners", tags=["Banners"])
 
+invalidate_on("banners", Banner)
+
 
 @router.get("", response_model=List[BannerResponse])
-def get_banners(
+@cached("banners", List[BannerResponse])
+async def get_banners(
     skip: int = 0,
     limit: int = 50,
     status: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    query = db.query(Banner)
+    query = select(Banner)
     
     if status:
         query = query.filter(Banner.status == status)
     
-    banners = query.offset(skip).limit(limit).all()
-    return banners
+    result = await db.execute(query.offset(skip).limit(limit))
+    return result.scalars().all()
@@ -1,31 +1,35 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from ..database import get_db
+from ..database import get_db, get_async_db
 from ..schemas.cart import CartItemCreate, CartItemUpdate, CartItemResponse
 from ..models.cart import CartItem
 from ..models.user import User
-from ..services.auth import get_current_user
+from ..services.auth import get_current_user, get_current_user_async
+from ..services.idempotency import idempotent
 
 router = APIRouter(prefix="/cart", tags=["Cart"])
 
 
 @router.get("", response_model=List[CartItemResponse])
-def get_cart(
-    db: Session = Depends(get_db),
-    current_user: Optional[User] = Depends(get_current_user)
+async def get_cart(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Optional[User] = Depends(get_current_user_async)
 ):
     # If no user logged in, return empty cart
     if not current_user:
         return []
     
-    cart_items = db.query(CartItem).filter(
+    result = await db.execute(select(CartItem).filter(
         CartItem.user_id == current_user.id
-    ).all()
-    return cart_items
+    ))
+    return result.scalars().all()
 
 
 @router.post("", response_model=CartItemResponse, status_code=200)
+@idempotent("cart", CartItemResponse)
 def add_to_cart(
     item_data: CartItemCreate,
     current_user: User = Depends(get_current_user),
@@ -1,20 +1,28 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List
-from ..database import get_db
+from ..database import get_async_db
 from ..schemas.category import CategoryResponse
-from ..models.category import Category
+from ..models.category import Category, CategoryItem
+from ..services.cache import cached, invalidate_on
 
 router = APIRouter(prefix="/categories", tags=["Categories"])
 
+invalidate_on("categories", Category, CategoryItem)
+
 
 @router.get("", response_model=List[CategoryResponse])
-def get_categories(
+@cached("categories", List[CategoryResponse])
+async def get_categories(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    categories = db.query(Category).filter(
-        Category.status == "active"
-    ).offset(skip).limit(limit).all()
-    return categories
+    result = await db.execute(
+        select(Category).options(selectinload(Category.items)).filter(
+            Category.status == "active"
+        ).offset(skip).limit(limit)
+    )
+    return result.scalars().all()
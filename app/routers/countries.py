@@ -4,11 +4,15 @@ from typing import List
 from ..database import get_db
 from ..schemas.country import CountryResponse
 from ..models.country import Country
+from ..services.cache import cached, invalidate_on
 
 router = APIRouter(prefix="/countries", tags=["Countries"])
 
+invalidate_on("countries", Country)
+
 
 @router.get("", response_model=List[CountryResponse])
+@cached("countries", List[CountryResponse])
 def get_countries(db: Session = Depends(get_db)):
     countries = db.query(Country).all()
     return countries
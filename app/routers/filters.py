@@ -4,11 +4,15 @@ from typing import Optional
 from ..database import get_db
 from ..schemas.filter import FilterResponse
 from ..models.filter import Filter
+from ..services.cache import cached, invalidate_on
 
 router = APIRouter(prefix="/filters", tags=["Filters"])
 
+invalidate_on("filters", Filter)
+
 
 @router.get("", response_model=FilterResponse)
+@cached("filters", FilterResponse)
 def get_filter(
     category: Optional[str] = None,
     db: Session = Depends(get_db)
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, contains_eager
 from sqlalchemy import or_
 from typing import List, Optional
 from ..database import get_db
@@ -13,6 +13,7 @@ from ..schemas.inventory import (
     InventoryTransactionResponse
 )
 from ..services.auth import get_current_user, require_admin
+from ..services.idempotency import idempotent
 from ..models.user import User
 from ..utils.helpers import generate_id
 from datetime import datetime
@@ -28,7 +29,7 @@ def get_inventory(
     db: Session = Depends(get_db)
 ):
     """Xem tồn kho tất cả sản phẩm (Admin only)"""
-    query = db.query(Inventory).join(Product)
+    query = db.query(Inventory).join(Product).options(contains_eager(Inventory.product))
     
     # Filter by search
     if search:
@@ -39,16 +40,16 @@ def get_inventory(
             )
         )
     
+    # Filter low stock if requested (indexed stored column, lowest availability first)
+    if low_stock_only:
+        query = query.filter(Inventory.stock_margin <= 0).order_by(Inventory.quantity_available, Inventory.id)
+    
     inventories = query.all()
     
     result = []
     for inv in inventories:
-        quantity_available = inv.quantity_on_hand - inv.quantity_reserved
-        is_low_stock = quantity_available <= inv.reorder_level
-        
-        # Filter low stock if requested
-        if low_stock_only and not is_low_stock:
-            continue
+        quantity_available = inv.quantity_available
+        is_low_stock = inv.stock_margin <= 0
         
         result.append(InventoryResponse(
             id=inv.id,
@@ -136,6 +137,7 @@ def update_inventory_settings(
 
 
 @router.post("/transactions", response_model=InventoryTransactionResponse, status_code=201)
+@idempotent("inventory_transactions", InventoryTransactionResponse, status_code=201)
 def create_inventory_transaction(
     transaction_data: InventoryTransactionCreate,
     current_user: User = Depends(require_admin),
@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from ..config import settings
+from ..database import engine, async_engine, get_db
+from ..services.auth import require_admin
+from ..services.cache import catalog_cache
+from ..services.report_cache import report_cache
+from ..services.idempotency import idempotency_store
+from ..services.jobs import queue_status
+from ..services.analytics import analytics_store
+from ..models.user import User
+from ..utils.pool import pool_status
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+
+@router.get("/cache")
+def get_cache_metrics(current_user: User = Depends(require_admin)):
+    """Hit/miss counters and memory usage of the in-process response caches (Admin only)"""
+    return {"caches": [catalog_cache.stats(), report_cache.stats()]}
+
+
+@router.get("/idempotency")
+def get_idempotency_metrics(current_user: User = Depends(require_admin), db: Session = Depends(get_db)):
+    """
+    Unexpired Idempotency-Key rows (all processes) and how often this process
+    replayed retries, waited on in-flight duplicates or rejected reused keys (Admin only)
+    """
+    return idempotency_store.stats(db)
+
+
+@router.get("/jobs")
+def get_job_metrics(current_user: User = Depends(require_admin), db: Session = Depends(get_db)):
+    """
+    Background job queue (Admin only): depth = pending outbox events,
+    lag_seconds = age of the oldest one, failed = events that gave up retrying
+    """
+    return queue_status(db)
+
+
+@router.get("/analytics")
+def get_analytics_metrics(current_user: User = Depends(require_admin)):
+    """Size, date_order watermark and refresh time of the in-memory analytics store (Admin only)"""
+    return analytics_store.stats()
+
+
+@router.get("/db-pool")
+def get_db_pool_metrics(current_user: User = Depends(require_admin)):
+    """
+    Connection pool saturation for this worker process (Admin only).
+    Steady checkout timeouts or a high max wait mean the pool is too small
+    for the request concurrency of one uvicorn worker.
+    """
+    return {
+        "pool_size_setting": settings.DB_POOL_SIZE,
+        "max_overflow_setting": settings.DB_MAX_OVERFLOW,
+        "pool_timeout_setting": settings.DB_POOL_TIMEOUT,
+        "pre_ping": settings.DB_POOL_PRE_PING,
+        "sync": pool_status(engine.pool),
+        "async": pool_status(async_engine.sync_engine.pool),
+    }
@@ -1,38 +1,53 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from ..database import get_db
-from ..schemas.order import OrderCreate, OrderWithItemsResponse, OrderItemSchema
-from ..models.order import Order, OrderItem
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select, insert
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from ..database import get_db, get_async_db
+from ..schemas.order import OrderCreate, OrderWithItemsResponse, OrderResponse, OrderStatusUpdate
+from ..models.order import Order, OrderItem, OrderStatus
 from ..models.user import User
-from ..models.product import Product
-from ..services.auth import get_current_user
+from ..services.auth import get_current_user, get_current_user_async
+from ..services.orders import enqueue_order_created, enqueue_order_cancelled
+from ..services.inventory import reserve_stock, release_stock, commit_stock
+from ..services.idempotency import idempotent
 from ..utils.helpers import generate_id
+from ..utils.pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor, keyset_filter
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
 
 @router.get("", response_model=List[OrderWithItemsResponse])
-def get_orders(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_orders(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    orders = db.query(Order).filter(
+    """
+    Newest orders first, `limit` per page; cursor: value of the X-Next-Cursor
+    header from the previous page. Items of the whole page are loaded with one
+    extra IN query.
+    """
+    query = select(Order).filter(
         Order.user_id == current_user.id
-    ).order_by(Order.date_order.desc()).all()
+    ).options(selectinload(Order.items)).order_by(Order.date_order.desc(), Order.id.desc())
+    
+    if cursor:
+        last_date, last_id = decode_cursor(cursor, "orders:date_order")
+        query = query.filter(keyset_filter([Order.date_order, Order.id], [last_date, last_id], descending=True))
     
-    result = []
-    for order in orders:
-        items = db.query(OrderItem).filter(OrderItem.order_id == order.id).all()
-        result.append({
-            "order": order,
-            "items": items
-        })
+    orders = (await db.execute(query.limit(limit))).scalars().all()
     
-    return result
+    if orders and len(orders) == limit:
+        last = orders[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor("orders:date_order", [last.date_order, last.id])
+    return [{"order": order, "items": order.items} for order in orders]
 
 
 @router.post("", status_code=200)
+@idempotent("orders", dict)
 def create_order(
     order_data: OrderCreate,
     current_user: User = Depends(get_current_user),
@@ -57,25 +72,85 @@ def create_order(
     )
     
     db.add(new_order)
+    db.flush()
+    
+    items = [
+        {
+            "order_id": order_id,
+            "product_id": item.product_id,
+            "name": item.name,
+            "img": item.img,
+            "color": item.color,
+            "quantity": item.quantity,
+            "price": item.price,
+        }
+        for item in order_data.items
+    ]
+    
+    # Reserve stock (409 if a product sold out; nothing is committed then)
+    reserve_stock(db, items)
     
-    # Create order items
-    for item in order_data.items:
-        order_item = OrderItem(
-            order_id=order_id,
-            product_id=item.product_id,
-            name=item.name,
-            img=item.img,
-            color=item.color,
-            quantity=item.quantity,
-            price=item.price
-        )
-        db.add(order_item)
-        
-        # Update product sell count
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        if product:
-            product.sell_count += item.quantity
+    # Create order items: one multi-row INSERT
+    if items:
+        db.execute(insert(OrderItem.__table__).values(items))
+    
+    # sell_count and other derived data are updated by a background job
+    enqueue_order_created(db, order_id, items)
     
     db.commit()
     
     return {"order_id": order_id}
+
+
+# Allowed status changes; delivered and cancelled are final
+ORDER_STATUS_TRANSITIONS = {
+    OrderStatus.pending: {OrderStatus.confirmed, OrderStatus.shipping, OrderStatus.delivered, OrderStatus.cancelled},
+    OrderStatus.confirmed: {OrderStatus.shipping, OrderStatus.delivered, OrderStatus.cancelled},
+    OrderStatus.shipping: {OrderStatus.delivered, OrderStatus.cancelled},
+    OrderStatus.delivered: set(),
+    OrderStatus.cancelled: set(),
+}
+
+
+@router.patch("/{order_id}/status", response_model=OrderResponse)
+def update_order_status(
+    order_id: str,
+    status_data: OrderStatusUpdate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Change an order's status. Admins may make any allowed transition; the
+    customer may only cancel their own order while it is pending.
+    Cancelling releases the reserved stock, delivering takes it out of stock.
+    """
+    # Row lock: two concurrent transitions must not both release/commit stock
+    order = db.query(Order).filter(Order.id == order_id).with_for_update().first()
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    
+    try:
+        new_status = OrderStatus(status_data.status)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid order status")
+    if current_user.role != "admin":
+        if order.user_id != current_user.id:
+            raise HTTPException(status_code=403, detail="Not authorized")
+        if new_status != OrderStatus.cancelled or order.status_order != OrderStatus.pending:
+            raise HTTPException(status_code=403, detail="Only pending orders can be cancelled")
+    
+    if new_status == order.status_order:
+        return order
+    if new_status not in ORDER_STATUS_TRANSITIONS[OrderStatus(order.status_order)]:
+        raise HTTPException(status_code=400, detail=f"Cannot change order status from {order.status_order.value} to {new_status.value}")
+    
+    if new_status == OrderStatus.cancelled:
+        release_stock(db, order.id)
+        enqueue_order_cancelled(db, order.id)
+    elif new_status == OrderStatus.delivered:
+        commit_stock(db, order.id, current_user.id)
+    order.status_order = new_status
+    
+    db.commit()
+    db.refresh(order)
+    return order
@@ -1,115 +1,262 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, asc
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, desc, asc
 from typing import List, Optional
-from ..database import get_db
-from ..schemas.product import ProductResponse, ReviewSchema, ReviewCreate, ReviewUpdate
+from ..database import get_db, get_async_db
+from ..schemas.product import (
+    ProductResponse, ProductItemSchema, ProductBatchResponse, ProductFacetsResponse,
+    ReviewSchema, ReviewCreate, ReviewUpdate
+)
 from ..models.product import Product
-from ..models.review import Review
+from ..models.review import Review, ProductRatingHistogram
 from ..models.user import User
 from ..services.auth import get_current_user
+from ..services.search import product_search
+from ..services.rankings import top_products
+from ..services.reviews import record_review_change, histogram_counts, paginate_reviews, next_review_cursor
+from ..services.facets import facet_query, summarize_facets, material_type, price_bucket_filter
 from ..utils.helpers import generate_id
+from ..utils.http import row_etag, etag_matches, not_modified
+from ..utils.pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor, keyset_filter
 
 router = APIRouter(prefix="/products", tags=["Products"])
 
+# Columns the product list can be sorted by; each has a (status, column, id) index
+PRODUCT_SORT_COLUMNS = {
+    "timestamp": Product.timestamp,
+    "current_price": Product.current_price,
+    "sell_count": Product.sell_count,
+    "review_avg": Product.review_avg,
+    "name": Product.name,
+}
 
-@router.get("", response_model=List[ProductResponse])
-def get_products(
-    skip: int = 0,
-    limit: int = 20,
+MAX_BATCH_IDS = 300
+
+
+def _filter_products(
+    db: AsyncSession,
     name: Optional[str] = None,
     category_id: Optional[str] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
-    sort_by: str = "timestamp",
-    order: str = "desc",
-    db: Session = Depends(get_db)
+    material: Optional[str] = None,
+    price: Optional[str] = None,
 ):
-    query = db.query(Product).filter(Product.status == "active")
+    """Active products matching the listing filters; returns (select, relevance expression or None)"""
+    query = select(Product).filter(Product.status == "active")
     
+    relevance = None
     if name:
-        query = query.filter(Product.name.like(f"%{name}%"))
+        search_filter, relevance = product_search(db, name)
+        query = query.filter(search_filter)
     if category_id:
         query = query.filter(Product.category_id == category_id)
     if min_price is not None:
         query = query.filter(Product.current_price >= min_price)
     if max_price is not None:
         query = query.filter(Product.current_price <= max_price)
+    if material:
+        query = query.filter(material_type == material)
+    if price:
+        bucket_filter = price_bucket_filter(price)
+        if bucket_filter is None:
+            raise HTTPException(status_code=400, detail="Unknown price range")
+        query = query.filter(*bucket_filter)
     
-    # Sorting
-    sort_column = getattr(Product, sort_by, Product.timestamp)
-    if order == "asc":
-        query = query.order_by(asc(sort_column))
+    return query, relevance
+
+
+@router.get("", response_model=List[ProductResponse])
+async def get_products(
+    response: Response,
+    skip: int = 0,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    name: Optional[str] = None,
+    category_id: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    material: Optional[str] = None,
+    price: Optional[str] = None,
+    sort_by: Optional[str] = None,
+    order: str = "desc",
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    List active products.
+    - name: full-text search over name, title and description (prefix match per word)
+    - material: material type (the "type" key of the material JSON)
+    - price: one of the price ranges from GET /filters, e.g. "$100-$500"
+    - sort_by: timestamp, current_price, sell_count, review_avg, name or relevance
+      (default: relevance when searching, otherwise timestamp)
+    - cursor: value of the X-Next-Cursor header from the previous page
+    """
+    query, relevance = _filter_products(db, name, category_id, min_price, max_price, material, price)
+    
+    # Relevance ranking is only meaningful for shallow result pages, so it uses offset paging
+    if relevance is not None and sort_by in (None, "relevance"):
+        if cursor:
+            raise HTTPException(status_code=400, detail="Relevance-sorted results are paged with skip, not cursor")
+        query = query.order_by(desc(relevance), Product.id).offset(skip).limit(limit)
+        return (await db.execute(query)).scalars().all()
+    
+    # Sorting (Product.id breaks ties so the order is stable across pages)
+    if sort_by not in PRODUCT_SORT_COLUMNS:
+        sort_by = "timestamp"
+    sort_column = PRODUCT_SORT_COLUMNS[sort_by]
+    descending = order != "asc"
+    direction = desc if descending else asc
+    query = query.order_by(direction(sort_column), direction(Product.id))
+    
+    # Keyset pagination: continue after the last row of the previous page
+    cursor_key = f"{sort_by}:{'desc' if descending else 'asc'}"
+    if cursor:
+        last_value, last_id = decode_cursor(cursor, cursor_key)
+        query = query.filter(keyset_filter([sort_column, Product.id], [last_value, last_id], descending))
     else:
-        query = query.order_by(desc(sort_column))
+        query = query.offset(skip)
+    
+    products = (await db.execute(query.limit(limit))).scalars().all()
     
-    products = query.offset(skip).limit(limit).all()
+    if products and len(products) == limit:
+        last = products[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(cursor_key, [getattr(last, sort_by), last.id])
     return products
 
 
+@router.get("/facets", response_model=ProductFacetsResponse)
+async def get_products_with_facets(
+    response: Response,
+    skip: int = 0,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    name: Optional[str] = None,
+    category_id: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    material: Optional[str] = None,
+    price: Optional[str] = None,
+    sort_by: Optional[str] = None,
+    order: str = "desc",
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Same filters and paging as GET /products, plus the number of matching
+    products for every category_id, price range and material value.
+    Each facet's counts apply all the other selected facets, not its own.
+    """
+    products = await get_products(
+        response, skip, limit, cursor, name, category_id, min_price, max_price,
+        material, price, sort_by, order, db
+    )
+    base_query, _ = _filter_products(db, name, min_price=min_price, max_price=max_price)
+    cells = (await db.execute(facet_query(base_query))).all()
+    total, facets = summarize_facets(cells, {"category_id": category_id, "price": price, "material": material})
+    return {"total": total, "products": products, "facets": facets}
+
+
 @router.get("/special/new-arrivals", response_model=List[ProductResponse])
-def get_new_arrivals(limit: int = 10, db: Session = Depends(get_db)):
-    products = db.query(Product).filter(
-        Product.status == "active"
-    ).order_by(desc(Product.timestamp)).limit(limit).all()
-    return products
+async def get_new_arrivals(limit: int = 10, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(top_products, "new_arrivals", limit)
 
 
 @router.get("/special/top-seller", response_model=List[ProductResponse])
-def get_top_seller(limit: int = 10, db: Session = Depends(get_db)):
-    products = db.query(Product).filter(
-        Product.status == "active"
-    ).order_by(desc(Product.sell_count)).limit(limit).all()
-    return products
+async def get_top_seller(limit: int = 10, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(top_products, "top_seller", limit)
 
 
 @router.get("/special/best-review", response_model=List[ProductResponse])
-def get_best_review(limit: int = 10, db: Session = Depends(get_db)):
-    products = db.query(Product).filter(
-        Product.status == "active"
-    ).order_by(desc(Product.review_avg)).limit(limit).all()
-    return products
+async def get_best_review(limit: int = 10, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(top_products, "best_review", limit)
 
 
 @router.get("/special/discount", response_model=List[ProductResponse])
-def get_discount(limit: int = 20, db: Session = Depends(get_db)):
-    products = db.query(Product).filter(
-        Product.status == "active",
-        Product.current_price < Product.root_price
-    ).order_by(desc(Product.root_price - Product.current_price)).limit(limit).all()
-    return products
+async def get_discount(limit: int = 20, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(top_products, "discount", limit)
+
+
+@router.get("/batch", response_model=ProductBatchResponse)
+async def get_products_batch(
+    ids: str = Query(..., description="Comma-separated product ids"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Look up many products at once (cart, favorites, banner products, order history).
+    Results follow the order of `ids`; unknown ids are null and listed in `missing`.
+    """
+    product_ids = list(dict.fromkeys(i.strip() for i in ids.split(",") if i.strip()))
+    if len(product_ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    
+    # One IN query for the products, one more for all their product_items
+    products = []
+    if product_ids:
+        products = (await db.execute(
+            select(Product).options(selectinload(Product.product_items)).filter(Product.id.in_(product_ids))
+        )).scalars().all()
+    by_id = {p.id: p for p in products}
+    
+    result = []
+    missing = []
+    for product_id in product_ids:
+        product = by_id.get(product_id)
+        if product is None:
+            result.append(None)
+            missing.append(product_id)
+            continue
+        response = ProductResponse.model_validate(product)
+        response.items = [ProductItemSchema.model_validate(item) for item in product.product_items]
+        result.append(response)
+    
+    return ProductBatchResponse(products=result, missing=missing)
 
 
 @router.get("/{product_id}", response_model=ProductResponse)
-def get_product(product_id: str, db: Session = Depends(get_db)):
-    product = db.query(Product).filter(Product.id == product_id).first()
+async def get_product(
+    product_id: str,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
+):
+    product = await db.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    return product
+    histogram = await db.get(ProductRatingHistogram, product_id)
+    
+    # Prices and stock change often: clients may keep a copy but must revalidate it
+    headers = {"ETag": row_etag(product, histogram), "Cache-Control": "no-cache"}
+    if etag_matches(request, headers["ETag"]):
+        return not_modified(headers)
+    response.headers.update(headers)
+    data = ProductResponse.model_validate(product)
+    data.rating_histogram = histogram_counts(histogram)
+    return data
 
 
 @router.get("/{product_id}/reviews", response_model=List[ReviewSchema])
-def get_product_reviews(
+async def get_product_reviews(
     product_id: str,
+    response: Response,
     skip: int = 0,
     limit: int = 20,
+    cursor: Optional[str] = None,
     sort_by: str = "timestamp",
     order: str = "desc",
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    query = db.query(Review).filter(Review.product_id == product_id)
+    """
+    - sort_by: timestamp (alias created_at) or rating (alias star)
+    - cursor: value of the X-Next-Cursor header from the previous page
+    """
+    query = select(Review).filter(Review.product_id == product_id)
+    query, sort_by, cursor_key = paginate_reviews(query, sort_by, order, cursor, skip)
     
-    # Map created_at to timestamp for frontend compatibility
-    if sort_by == "created_at":
-        sort_by = "timestamp"
-    
-    sort_column = getattr(Review, sort_by, Review.timestamp)
-    if order == "asc":
-        query = query.order_by(asc(sort_column))
-    else:
-        query = query.order_by(desc(sort_column))
+    reviews = (await db.execute(query.limit(limit))).scalars().all()
     
-    reviews = query.offset(skip).limit(limit).all()
+    next_cursor = next_review_cursor(reviews, limit, sort_by, cursor_key)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return reviews
 
 
@@ -130,19 +277,14 @@ def create_review(
         id=generate_id("REV"),
         product_id=product_id,
         user_id=current_user.id,
-        order_id=review_data.order_id,
-        star=review_data.star,
-        message=review_data.message,
-        img=review_data.img,
-        service=review_data.service
+        rating=review_data.star,
+        comment=review_data.message
     )
     
     db.add(new_review)
     
-    # Update product review average
-    all_reviews = db.query(Review).filter(Review.product_id == product_id).all()
-    total_stars = sum(r.star for r in all_reviews) + review_data.star
-    product.review_avg = total_stars / (len(all_reviews) + 1)
+    # Update product review aggregates (atomic, independent of the review count)
+    record_review_change(db, product_id, None, review_data.star)
     
     db.commit()
     db.refresh(new_review)
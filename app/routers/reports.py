@@ -1,27 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, extract, and_
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import func, or_
 from typing import List, Optional
-from datetime import datetime, date
 from ..database import get_db
-from ..models.order import Order, OrderItem
+from ..models.order import Order
 from ..models.product import Product
 from ..models.inventory import Inventory
+from ..models.sales import SalesDailyRollup, SalesDailyProductRollup
 from ..schemas.report import (
     RevenueReport,
     RevenueByPeriod,
     OrderDetailReport,
     OrderDetailItem,
     TopProductReport,
-    LowStockAlert
+    LowStockAlert,
+    AnalyticsReport
 )
 from ..services.auth import require_admin
+from ..services.reports import (
+    parse_date_range, date_range_filter, period_label, customer_name_filter,
+    export_orders_csv, export_orders_ndjson
+)
+from ..services.sales import day_range
+from ..services.analytics import DIMENSIONS, run_query
+from ..services.cache import invalidate_on
+from ..services.report_cache import report_cache, cached_report, invalidate_days_on
 from ..models.user import User
+from ..utils.pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor, keyset_filter
 
 router = APIRouter(prefix="/reports", tags=["Reports"])
 
+invalidate_days_on("revenue", SalesDailyRollup)
+invalidate_days_on("top-products", SalesDailyProductRollup)
+invalidate_on("low-stock", Inventory, cache=report_cache)
+
 
 @router.get("/revenue", response_model=RevenueReport)
+@cached_report("revenue", RevenueReport)
 def get_revenue_report(
     period: str = Query(..., regex="^(daily|monthly|yearly)$"),
     from_date: Optional[str] = None,
@@ -30,55 +46,36 @@ def get_revenue_report(
     db: Session = Depends(get_db)
 ):
     """
-    Báo cáo doanh thu theo ngày/tháng/năm
+    Báo cáo doanh thu theo ngày/tháng/năm (đọc từ sales_daily_rollup, không tính đơn đã hủy)
     - period: daily, monthly, yearly
     - from_date: YYYY-MM-DD (optional)
-    - to_date: YYYY-MM-DD (optional)
+    - to_date: YYYY-MM-DD (optional, inclusive)
     """
-    query = db.query(Order)
-    
-    # Filter by date range
-    if from_date:
-        query = query.filter(Order.timestamp >= datetime.fromisoformat(from_date))
-    if to_date:
-        query = query.filter(Order.timestamp <= datetime.fromisoformat(to_date))
-    
-    orders = query.all()
-    
-    # Group by period
-    revenue_data = {}
+    first_day, last_day = day_range(*parse_date_range(from_date, to_date))
     
-    for order in orders:
-        if period == "daily":
-            key = order.timestamp.strftime("%Y-%m-%d")
-        elif period == "monthly":
-            key = order.timestamp.strftime("%Y-%m")
-        else:  # yearly
-            key = order.timestamp.strftime("%Y")
-        
-        if key not in revenue_data:
-            revenue_data[key] = {
-                "total_orders": 0,
-                "total_revenue": 0,
-                "total_products_sold": 0
-            }
-        
-        revenue_data[key]["total_orders"] += 1
-        revenue_data[key]["total_revenue"] += order.total_order
-        
-        # Count products sold
-        items = db.query(OrderItem).filter(OrderItem.order_id == order.id).all()
-        revenue_data[key]["total_products_sold"] += sum(item.quantity for item in items)
+    # Read the daily rollup (one row per day) and bucket it in the database
+    bucket = period_label(SalesDailyRollup.day, period, db.bind.dialect.name).label("bucket")
+    query = db.query(
+        bucket,
+        func.sum(SalesDailyRollup.order_count).label("total_orders"),
+        func.sum(SalesDailyRollup.revenue).label("total_revenue"),
+        func.sum(SalesDailyRollup.units_sold).label("total_products_sold")
+    )
+    if first_day:
+        query = query.filter(SalesDailyRollup.day >= first_day)
+    if last_day:
+        query = query.filter(SalesDailyRollup.day < last_day)
+    # Days whose orders were all cancelled stay in the rollup with zero counts
+    rows = query.group_by(bucket).having(func.sum(SalesDailyRollup.order_count) > 0).order_by(bucket).all()
     
-    # Convert to list
     data_list = [
         RevenueByPeriod(
-            date=date_key,
-            total_orders=data["total_orders"],
-            total_revenue=data["total_revenue"],
-            total_products_sold=data["total_products_sold"]
+            date=row.bucket,
+            total_orders=row.total_orders,
+            total_revenue=row.total_revenue,
+            total_products_sold=row.total_products_sold
         )
-        for date_key, data in sorted(revenue_data.items())
+        for row in rows
     ]
     
     # Calculate totals
@@ -95,35 +92,38 @@ def get_revenue_report(
     )
 
 
-@router.get("/orders/{order_id}", response_model=OrderDetailReport)
-def get_order_detail(
-    order_id: str,
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+# Declared before /orders/{order_id} so "export" isn't taken for an order id
+@router.get("/orders/export")
+def export_orders(
+    format: str = Query("csv", regex="^(csv|ndjson)$"),
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None,
+    customer_name: Optional[str] = None,
+    current_user: User = Depends(require_admin)
 ):
-    """Xem chi tiết hóa đơn: sản phẩm, khách hàng"""
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    # Get order items
-    order_items = db.query(OrderItem).filter(OrderItem.order_id == order_id).all()
-    
-    items_list = [
-        OrderDetailItem(
-            product_id=item.product_id,
-            product_name=item.name,
-            color=item.color,
-            quantity=item.quantity,
-            price=item.price,
-            line_total=item.quantity * item.price
-        )
-        for item in order_items
-    ]
-    
+    """
+    Xuất tất cả hóa đơn kèm sản phẩm (không giới hạn số lượng), dữ liệu được
+    stream dần nên bộ nhớ không phụ thuộc vào khoảng thời gian
+    - format: csv (một dòng mỗi sản phẩm) hoặc ndjson (một dòng mỗi hóa đơn)
+    - from_date, to_date: YYYY-MM-DD (optional, to_date inclusive)
+    """
+    start, end = parse_date_range(from_date, to_date)
+    filename = f"orders_{from_date or 'all'}_{to_date or 'now'}.{format}"
+    if format == "csv":
+        body, media_type = export_orders_csv(start, end, customer_name), "text/csv; charset=utf-8"
+    else:
+        body, media_type = export_orders_ndjson(start, end, customer_name), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+def _order_detail(order: Order) -> OrderDetailReport:
     return OrderDetailReport(
         id=order.id,
-        order_date=order.timestamp,
+        order_date=order.date_order,
         customer_name=order.full_name,
         customer_phone=order.phone,
         customer_address=f"{order.address}, {order.city}, {order.country}",
@@ -132,65 +132,74 @@ def get_order_detail(
         vat=order.vat,
         delivery_fee=order.delivery_fee,
         total_order=order.total_order,
-        items=items_list
+        items=[
+            OrderDetailItem(
+                product_id=item.product_id,
+                product_name=item.name,
+                color=item.color,
+                quantity=item.quantity,
+                price=item.price,
+                line_total=item.quantity * item.price
+            )
+            for item in order.items
+        ]
     )
 
 
+@router.get("/orders/{order_id}", response_model=OrderDetailReport)
+def get_order_detail(
+    order_id: str,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Xem chi tiết hóa đơn: sản phẩm, khách hàng"""
+    # Order and its items in one query
+    order = db.query(Order).options(joinedload(Order.items)).filter(Order.id == order_id).first()
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    
+    return _order_detail(order)
+
+
 @router.get("/orders", response_model=List[OrderDetailReport])
 def get_all_orders(
+    response: Response,
     from_date: Optional[str] = None,
     to_date: Optional[str] = None,
     customer_name: Optional[str] = None,
-    limit: int = 50,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
     current_user: User = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
-    """Xem tất cả hóa đơn với filter"""
-    query = db.query(Order)
+    """
+    Xem tất cả hóa đơn với filter, mới nhất trước
+    - customer_name: tìm theo tên khách hàng (FULLTEXT ngram trên MySQL)
+    - cursor: giá trị header X-Next-Cursor của trang trước
+    """
+    # Items of the whole page are loaded with one extra IN query
+    query = db.query(Order).options(selectinload(Order.items))
     
-    if from_date:
-        query = query.filter(Order.timestamp >= datetime.fromisoformat(from_date))
-    if to_date:
-        query = query.filter(Order.timestamp <= datetime.fromisoformat(to_date))
+    start, end = parse_date_range(from_date, to_date)
+    query = query.filter(*date_range_filter(Order.date_order, start, end))
     if customer_name:
-        query = query.filter(Order.full_name.ilike(f"%{customer_name}%"))
+        query = query.filter(customer_name_filter(db, customer_name))
     
-    orders = query.order_by(Order.timestamp.desc()).limit(limit).all()
+    query = query.order_by(Order.date_order.desc(), Order.id.desc())
+    if cursor:
+        last_date, last_id = decode_cursor(cursor, "reports:orders")
+        query = query.filter(keyset_filter([Order.date_order, Order.id], [last_date, last_id], descending=True))
     
-    result = []
-    for order in orders:
-        order_items = db.query(OrderItem).filter(OrderItem.order_id == order.id).all()
-        
-        items_list = [
-            OrderDetailItem(
-                product_id=item.product_id,
-                product_name=item.name,
-                color=item.color,
-                quantity=item.quantity,
-                price=item.price,
-                line_total=item.quantity * item.price
-            )
-            for item in order_items
-        ]
-        
-        result.append(OrderDetailReport(
-            id=order.id,
-            order_date=order.timestamp,
-            customer_name=order.full_name,
-            customer_phone=order.phone,
-            customer_address=f"{order.address}, {order.city}, {order.country}",
-            payment_method=order.payment_method,
-            sub_total=order.sub_total,
-            vat=order.vat,
-            delivery_fee=order.delivery_fee,
-            total_order=order.total_order,
-            items=items_list
-        ))
+    orders = query.limit(limit).all()
     
-    return result
+    if orders and len(orders) == limit:
+        last = orders[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor("reports:orders", [last.date_order, last.id])
+    return [_order_detail(order) for order in orders]
 
 
 @router.get("/top-products", response_model=List[TopProductReport])
+@cached_report("top-products", List[TopProductReport])
 def get_top_products(
     limit: int = 10,
     from_date: Optional[str] = None,
@@ -198,21 +207,25 @@ def get_top_products(
     current_user: User = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
-    """Top sản phẩm bán chạy"""
+    """Top sản phẩm bán chạy (không tính đơn đã hủy)"""
+    first_day, last_day = day_range(*parse_date_range(from_date, to_date))
+    
+    total_quantity = func.sum(SalesDailyProductRollup.units_sold).label("total_quantity")
     query = db.query(
-        OrderItem.product_id,
+        SalesDailyProductRollup.product_id,
         Product.name,
-        func.sum(OrderItem.quantity).label("total_quantity"),
-        func.sum(OrderItem.quantity * OrderItem.price).label("total_revenue")
-    ).join(Product).join(Order)
+        total_quantity,
+        func.sum(SalesDailyProductRollup.revenue).label("total_revenue")
+    ).join(Product, Product.id == SalesDailyProductRollup.product_id)
     
-    if from_date:
-        query = query.filter(Order.timestamp >= datetime.fromisoformat(from_date))
-    if to_date:
-        query = query.filter(Order.timestamp <= datetime.fromisoformat(to_date))
+    if first_day:
+        query = query.filter(SalesDailyProductRollup.day >= first_day)
+    if last_day:
+        query = query.filter(SalesDailyProductRollup.day < last_day)
     
-    results = query.group_by(OrderItem.product_id, Product.name)\
-                   .order_by(func.sum(OrderItem.quantity).desc())\
+    results = query.group_by(SalesDailyProductRollup.product_id, Product.name)\
+                   .having(total_quantity > 0)\
+                   .order_by(total_quantity.desc())\
                    .limit(limit)\
                    .all()
     
@@ -228,31 +241,72 @@ def get_top_products(
 
 
 @router.get("/low-stock", response_model=List[LowStockAlert])
+@cached_report("low-stock", List[LowStockAlert])
 def get_low_stock_alerts(
+    status: Optional[str] = Query(None, regex="^(low_stock|out_of_stock)$"),
     current_user: User = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
-    """Cảnh báo sản phẩm sắp hết hàng"""
-    inventories = db.query(Inventory).join(Product).all()
+    """
+    Cảnh báo sản phẩm sắp hết hàng, ít hàng nhất trước
+    - status: low_stock hoặc out_of_stock (optional, mặc định cả hai)
+    """
+    query = db.query(
+        Inventory.product_id,
+        Product.name,
+        Inventory.quantity_available,
+        Inventory.reorder_level,
+        Inventory.reorder_quantity
+    ).join(Product, Product.id == Inventory.product_id)
+    
+    # Both conditions are on indexed stored columns (see models.inventory)
+    out_of_stock = Inventory.quantity_available <= 0
+    if status == "out_of_stock":
+        query = query.filter(out_of_stock)
+    elif status == "low_stock":
+        query = query.filter(Inventory.stock_margin <= 0, Inventory.quantity_available > 0)
+    else:
+        query = query.filter(or_(Inventory.stock_margin <= 0, out_of_stock))
     
-    alerts = []
-    for inv in inventories:
-        quantity_available = inv.quantity_on_hand - inv.quantity_reserved
-        
-        if quantity_available <= 0:
-            status = "out_of_stock"
-        elif quantity_available <= inv.reorder_level:
-            status = "low_stock"
-        else:
-            continue
-        
-        alerts.append(LowStockAlert(
-            product_id=inv.product_id,
-            product_name=inv.product.name,
-            quantity_available=quantity_available,
-            reorder_level=inv.reorder_level,
-            reorder_quantity=inv.reorder_quantity,
-            status=status
-        ))
+    rows = query.order_by(Inventory.quantity_available, Inventory.product_id).all()
     
-    return sorted(alerts, key=lambda x: x.quantity_available)
+    return [
+        LowStockAlert(
+            product_id=row.product_id,
+            product_name=row.name,
+            quantity_available=row.quantity_available,
+            reorder_level=row.reorder_level,
+            reorder_quantity=row.reorder_quantity,
+            status="out_of_stock" if row.quantity_available <= 0 else "low_stock"
+        )
+        for row in rows
+    ]
+
+
+@router.get("/analytics", response_model=AnalyticsReport, response_model_exclude_none=True)
+def get_analytics(
+    dimension: str = Query(..., regex=f"^({'|'.join(DIMENSIONS)})$"),
+    metrics: str = "revenue,orders",
+    sort: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=1000),
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None,
+    current_user: User = Depends(require_admin)
+):
+    """
+    Phân tích doanh số theo một chiều bất kỳ (không tính đơn đã hủy), tính trên bộ nhớ
+    - dimension: category, product, city, country, payment_method, hour, weekday, day, month
+    - metrics: revenue, units, lines, orders (phân cách bằng dấu phẩy)
+    - sort: metric để lấy top `limit` (mặc định metric đầu tiên; chiều thời gian mặc định theo thứ tự thời gian)
+    - from_date, to_date: YYYY-MM-DD (optional, to_date inclusive)
+    """
+    start, end = parse_date_range(from_date, to_date)
+    result = run_query(
+        dimension,
+        [metric.strip() for metric in metrics.split(",") if metric.strip()],
+        sort=sort,
+        limit=limit,
+        start=start,
+        end=end
+    )
+    return AnalyticsReport(from_date=from_date, to_date=to_date, **result)
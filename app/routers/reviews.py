@@ -3,9 +3,9 @@ from sqlalchemy.orm import Session
 from ..database import get_db
 from ..schemas.product import ReviewSchema, ReviewUpdate
 from ..models.review import Review
-from ..models.product import Product
 from ..models.user import User
 from ..services.auth import get_current_user
+from ..services.reviews import record_review_change
 
 router = APIRouter(prefix="/reviews", tags=["Reviews"])
 
@@ -17,33 +17,31 @@ def update_review(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    review = db.query(Review).filter(Review.id == review_id).first()
+    # Row lock: the aggregate delta depends on the rating being replaced
+    review = db.query(Review).filter(Review.id == review_id).with_for_update().first()
     if not review:
         raise HTTPException(status_code=404, detail="Review not found")
     
     if review.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
+    old_rating = review.rating
     if review_update.star is not None:
-        review.star = review_update.star
+        review.rating = review_update.star
     if review_update.message is not None:
-        review.message = review_update.message
+        review.comment = review_update.message
     if review_update.img is not None:
         review.img = review_update.img
     if review_update.service is not None:
         review.service = review_update.service
     
+    # Update product review aggregates in the same transaction
+    if review.rating != old_rating:
+        record_review_change(db, review.product_id, old_rating, review.rating)
+    
     db.commit()
     db.refresh(review)
     
-    # Update product review average
-    product = db.query(Product).filter(Product.id == review.product_id).first()
-    if product:
-        all_reviews = db.query(Review).filter(Review.product_id == review.product_id).all()
-        if all_reviews:
-            product.review_avg = sum(r.star for r in all_reviews) / len(all_reviews)
-            db.commit()
-    
     return review
 
 
@@ -53,25 +51,19 @@ def delete_review(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    review = db.query(Review).filter(Review.id == review_id).first()
+    # Row lock: the aggregate delta depends on the rating being replaced
+    review = db.query(Review).filter(Review.id == review_id).with_for_update().first()
     if not review:
         raise HTTPException(status_code=404, detail="Review not found")
     
     if review.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    product_id = review.product_id
     db.delete(review)
-    db.commit()
     
-    # Update product review average
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if product:
-        all_reviews = db.query(Review).filter(Review.product_id == product_id).all()
-        if all_reviews:
-            product.review_avg = sum(r.star for r in all_reviews) / len(all_reviews)
-        else:
-            product.review_avg = 0
-        db.commit()
+    # Update product review aggregates in the same transaction
+    record_review_change(db, review.product_id, review.rating, None)
+    
+    db.commit()
     
     return None
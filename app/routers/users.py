@@ -1,12 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from ..database import get_db
 from ..schemas.user import UserResponse, UserUpdate
 from ..schemas.product import ReviewSchema
 from ..models.user import User
 from ..models.review import Review
 from ..services.auth import get_current_user
+from ..services.reviews import paginate_reviews, next_review_cursor
+from ..utils.pagination import NEXT_CURSOR_HEADER
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
@@ -40,12 +42,19 @@ def update_current_user(
 
 @router.get("/me/reviews", response_model=List[ReviewSchema])
 def get_my_reviews(
+    response: Response,
     skip: int = 0,
     limit: int = 20,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    reviews = db.query(Review).filter(
-        Review.user_id == current_user.id
-    ).offset(skip).limit(limit).all()
+    """Newest first; cursor: value of the X-Next-Cursor header from the previous page"""
+    query = db.query(Review).filter(Review.user_id == current_user.id)
+    query, sort_by, cursor_key = paginate_reviews(query, "timestamp", "desc", cursor, skip)
+    reviews = query.limit(limit).all()
+    
+    next_cursor = next_review_cursor(reviews, limit, sort_by, cursor_key)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return reviews
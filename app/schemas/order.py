@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime
 
@@ -8,7 +8,7 @@ class OrderItemSchema(BaseModel):
     name: str
     img: Optional[str] = None
     color: Optional[str] = None
-    quantity: int
+    quantity: int = Field(gt=0)
     price: float
 
     class Config:
@@ -55,3 +55,7 @@ class OrderResponse(BaseModel):
 class OrderWithItemsResponse(BaseModel):
     order: OrderResponse
     items: List[OrderItemSchema]
+
+
+class OrderStatusUpdate(BaseModel):
+    status: str  # pending, confirmed, shipping, delivered, cancelled
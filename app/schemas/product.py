@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, AliasChoices
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
@@ -16,8 +16,8 @@ class ReviewSchema(BaseModel):
     id: str
     user_id: str
     order_id: Optional[str] = None
-    star: float
-    message: Optional[str] = None
+    star: float = Field(validation_alias=AliasChoices("star", "rating"))  # Review.rating in DB
+    message: Optional[str] = Field(None, validation_alias=AliasChoices("message", "comment"))  # Review.comment in DB
     img: Optional[List[str]] = None
     service: Optional[Dict[str, Any]] = None
     timestamp: datetime
@@ -56,11 +56,28 @@ class ProductResponse(BaseModel):
     timestamp: datetime
     items: List[ProductItemSchema] = []
     reviews: List[ReviewSchema] = []
+    rating_histogram: Optional[Dict[str, int]] = None  # Star ("1".."5") -> review count; product detail only
 
     class Config:
         from_attributes = True
 
 
+class ProductBatchResponse(BaseModel):
+    products: List[Optional[ProductResponse]]  # Same order as the requested ids, null if not found
+    missing: List[str] = []
+
+
+class FacetValue(BaseModel):
+    value: str
+    count: int
+
+
+class ProductFacetsResponse(BaseModel):
+    total: int  # Products matching every filter, across all pages
+    products: List[ProductResponse]
+    facets: Dict[str, List[FacetValue]]  # category_id, price, material
+
+
 class ReviewCreate(BaseModel):
     product_id: str
     order_id: Optional[str] = None
@@ -24,7 +24,7 @@ class RevenueReport(BaseModel):
 class OrderDetailItem(BaseModel):
     product_id: str
     product_name: str
-    color: Optional[dict] = None
+    color: Optional[str] = None
     quantity: int
     price: float
     line_total: float
@@ -66,3 +66,23 @@ class LowStockAlert(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+# Analytics (in-memory column store)
+class AnalyticsRow(BaseModel):
+    key: Optional[str] = None  # Group value: category/product id, city, ..., hour "00"-"23", weekday, YYYY-MM-DD, YYYY-MM
+    revenue: Optional[float] = None
+    units: Optional[int] = None
+    lines: Optional[int] = None
+    orders: Optional[int] = None
+
+
+class AnalyticsReport(BaseModel):
+    dimension: str
+    metrics: List[str]
+    sort: Optional[str] = None
+    from_date: Optional[str] = None
+    to_date: Optional[str] = None
+    lines_scanned: int
+    refreshed_at: Optional[datetime] = None
+    rows: List[AnalyticsRow]
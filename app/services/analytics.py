@@ -0,0 +1,437 @@
+"""
+In-memory column store for ad-hoc sales analytics (GET /reports/analytics).
+
+Order lines of non-cancelled orders are held in NumPy arrays, one per
+column, with text dimensions (category, city, payment method, ...)
+dictionary-encoded as integer codes. A query is a filter mask, one
+np.bincount per metric over the group codes and a partial sort for the top
+k, so any dimension/metric combination is answered without a dedicated
+SQL report, in about 100 ms over 10M lines on one core
+(benchmarks/bench_analytics.py).
+
+The store loads on first use and refreshes, when queried, at most every
+ANALYTICS_REFRESH_INTERVAL seconds. Orders past the date_order watermark
+are appended; the last ANALYTICS_WATERMARK_OVERLAP seconds before it are
+read again because orders don't commit in date_order order, and ids loaded
+already are skipped. order_cancelled outbox events past the last one seen
+drop their orders' lines; `manage.py jobs purge` deletes processed events,
+so a store not refreshed for ANALYTICS_RELOAD_AFTER seconds reloads from
+order statuses instead. A refresh that fails partway leaves the store as it
+was. Line revenue is quantity x price, as in the top-products report, and a
+line keeps the category its product had when it was loaded. Like the
+response caches, the store lives in this worker process; it takes about 65
+bytes per order line.
+"""
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models.order import Order, OrderItem, OrderStatus
+from ..models.outbox import OutboxEvent
+from ..models.product import Product
+from .orders import ORDER_CANCELLED
+
+logger = logging.getLogger(__name__)
+
+TEXT_DIMENSIONS = ("category", "product", "city", "country", "payment_method")
+LINE_DIMENSIONS = ("category", "product")   # May differ between the lines of one order
+TIME_DIMENSIONS = ("hour", "weekday", "day", "month")
+DIMENSIONS = TEXT_DIMENSIONS + TIME_DIMENSIONS
+METRICS = ("revenue", "units", "lines", "orders")
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+# Per-line columns; text dimensions hold codes into the store's dictionaries
+COLUMN_TYPES = {
+    "ts": np.int64,              # date_order, seconds since 1970-01-01 (UTC, like date_order)
+    "order": np.int32,           # Index into the store's order ids
+    "active": np.bool_,          # False once the order is cancelled
+    "quantity": np.float64,      # Float like revenue: bincount weights are float64
+    "revenue": np.float64,
+    **{name: np.int32 for name in TEXT_DIMENSIONS},
+    # Derived from ts when appended, so queries don't do date arithmetic
+    "hour": np.int8,
+    "weekday": np.int8,
+    "day": np.int32,             # Days since 1970-01-01
+    "month": np.int32,           # Months since 1970-01
+    # Lines that count their order once for the "orders" metric
+    "first_line": np.bool_,
+    **{f"first_{name}": np.bool_ for name in LINE_DIMENSIONS},
+}
+
+EPOCH = datetime(1970, 1, 1)
+LOAD_CHUNK = 50000
+
+
+def _seconds(value: datetime) -> int:
+    return int((value - EPOCH).total_seconds())
+
+
+class _Dictionary:
+    """Text value <-> dense integer code"""
+
+    def __init__(self):
+        self.values: List[Optional[str]] = []
+        self._codes: Dict[Optional[str], int] = {}
+
+    def encode(self, values: Sequence[Optional[str]]) -> np.ndarray:
+        codes = self._codes
+        encoded = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(self.values)
+                self.values.append(value)
+            encoded[i] = code
+        return encoded
+
+
+def _first_in_order(order: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    """True for lines whose code doesn't occur on an earlier line of the same (contiguous) order"""
+    first = np.ones(len(order), dtype=np.bool_)
+    candidates = np.arange(1, len(order))
+    lag = 1
+    # Lines `lag` apart in the same order; most orders are short, so this shrinks fast
+    while len(candidates):
+        candidates = candidates[candidates >= lag]
+        candidates = candidates[order[candidates] == order[candidates - lag]]
+        first[candidates[codes[candidates] == codes[candidates - lag]]] = False
+        lag += 1
+    return first
+
+
+class _Snapshot:
+    """Immutable view of the store that queries read without taking its lock"""
+
+    def __init__(self, size: int, columns: Dict[str, np.ndarray], labels: Dict[str, List[Optional[str]]],
+                 ranges: Dict[str, Tuple[int, int]], cancelled: bool, refreshed_at: Optional[datetime]):
+        self.size = size
+        self.columns = {name: column[:size] for name, column in columns.items()}
+        self.labels = labels
+        self.ranges = ranges          # Smallest and largest day/month loaded
+        self.cancelled = cancelled    # Some lines are inactive
+        self.refreshed_at = refreshed_at
+
+
+class AnalyticsStore:
+    def __init__(self):
+        self._reset()
+        self._snapshot: Optional[_Snapshot] = None
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+        self.refreshes = 0
+        self.last_refresh_ms = 0.0
+
+    def _reset(self) -> None:
+        # The published snapshot keeps its own slices and labels
+        self.dictionaries = {name: _Dictionary() for name in TEXT_DIMENSIONS}
+        self._columns = {name: np.empty(0, dtype=dtype) for name, dtype in COLUMN_TYPES.items()}
+        self._size = 0
+        self._order_ids = np.empty(0, dtype="S1")
+        self._ranges: Dict[str, Tuple[int, int]] = {}
+        self._cancelled = False
+        self._watermark: Optional[datetime] = None   # Latest date_order loaded
+        self._recent: Dict[str, datetime] = {}        # Order ids loaded within the overlap window
+        self._last_event_id = 0                       # Last order_cancelled outbox event applied
+
+    # Loading
+
+    def append_columns(self, order_ids: Sequence[str], columns: Dict[str, np.ndarray]) -> None:
+        """
+        Append encoded lines of new orders: columns["order"] indexes
+        order_ids, and each order's lines must be contiguous
+        """
+        count = len(columns["order"])
+        if count == 0:
+            return
+        ts = columns["ts"]
+        order = columns["order"] + len(self._order_ids)
+        first_line = np.ones(count, dtype=np.bool_)
+        first_line[1:] = order[1:] != order[:-1]
+        day = ts // 86400
+        extra = {
+            "order": order,
+            "active": np.ones(count, dtype=np.bool_),
+            "hour": ts // 3600 % 24,
+            "weekday": (day + 3) % 7,   # 1970-01-01 was a Thursday
+            "day": day,
+            "month": ts.astype("datetime64[s]").astype("datetime64[M]").astype(np.int64),
+            "first_line": first_line,
+            **{f"first_{name}": _first_in_order(order, columns[name]) for name in LINE_DIMENSIONS},
+        }
+        for name in ("day", "month"):
+            low, high = int(extra[name].min()), int(extra[name].max())
+            if name in self._ranges:
+                low, high = min(low, self._ranges[name][0]), max(high, self._ranges[name][1])
+            self._ranges[name] = (low, high)
+
+        needed = self._size + count
+        if needed > len(self._columns["ts"]):
+            capacity = max(needed, 2 * len(self._columns["ts"]), 1024)
+            for name, column in self._columns.items():
+                grown = np.empty(capacity, dtype=column.dtype)
+                grown[:self._size] = column[:self._size]
+                self._columns[name] = grown
+        # Lines past the current snapshot's size are invisible to it, so writing in place is safe
+        for name, column in self._columns.items():
+            column[self._size:needed] = extra[name] if name in extra else columns[name]
+        self._size = needed
+        self._order_ids = np.concatenate([self._order_ids, np.array(order_ids, dtype=np.bytes_)])
+
+    def _append_rows(self, rows: List[Any]) -> None:
+        # Rows are sorted by order id, so an order's lines are contiguous
+        order_ids: List[str] = []
+        order = np.empty(len(rows), dtype=np.int32)
+        for i, row in enumerate(rows):
+            if not order_ids or order_ids[-1] != row.order_id:
+                order_ids.append(row.order_id)
+            order[i] = len(order_ids) - 1
+        quantity = np.fromiter((row.quantity for row in rows), dtype=np.float64, count=len(rows))
+        price = np.fromiter((row.price for row in rows), dtype=np.float64, count=len(rows))
+        self.append_columns(order_ids, {
+            "ts": np.fromiter((_seconds(row.date_order) for row in rows), dtype=np.int64, count=len(rows)),
+            "order": order,
+            "quantity": quantity,
+            "revenue": quantity * price,
+            **{name: self.dictionaries[name].encode([getattr(row, name) for row in rows]) for name in TEXT_DIMENSIONS},
+        })
+
+    def _load_orders(self, db: Session) -> None:
+        overlap = timedelta(seconds=settings.ANALYTICS_WATERMARK_OVERLAP)
+        since = self._watermark - overlap if self._watermark is not None else None
+        newest = db.scalar(select(func.max(Order.date_order)))
+        if newest is None:
+            return
+        # Everything committed up to `newest` is read now; only ids that fall
+        # inside the next overlap window need remembering
+        watermark = max(newest, self._watermark) if self._watermark is not None else newest
+        keep_from = newest - overlap
+        query = (
+            select(
+                Order.id.label("order_id"), Order.date_order, Order.city, Order.country, Order.payment_method,
+                OrderItem.product_id.label("product"), Product.category_id.label("category"),
+                OrderItem.quantity, OrderItem.price,
+            )
+            .join(OrderItem, OrderItem.order_id == Order.id)
+            .outerjoin(Product, Product.id == OrderItem.product_id)
+            .where(Order.status_order != OrderStatus.cancelled, Order.date_order.isnot(None))
+            .order_by(Order.id, OrderItem.id)
+        )
+        if since is not None:
+            query = query.where(Order.date_order >= since)
+
+        rows: List[Any] = []
+        loaded: Dict[str, datetime] = {}
+        size, order_ids, ranges = self._size, self._order_ids, dict(self._ranges)
+        try:
+            for row in db.execute(query.execution_options(yield_per=LOAD_CHUNK)):
+                if row.order_id in self._recent:
+                    continue
+                # Flush between orders only, so an order never spans two appends
+                if len(rows) >= LOAD_CHUNK and rows[-1].order_id != row.order_id:
+                    self._append_rows(rows)
+                    rows = []
+                rows.append(row)
+                if row.date_order >= keep_from:
+                    loaded[row.order_id] = row.date_order
+                watermark = max(watermark, row.date_order)
+            self._append_rows(rows)
+        except Exception:
+            # Drop the chunks appended so far (invisible to the snapshot), so the
+            # next refresh reads them again from the unchanged watermark
+            self._size, self._order_ids, self._ranges = size, order_ids, ranges
+            raise
+
+        self._watermark = watermark
+        cutoff = watermark - overlap
+        self._recent.update(loaded)
+        self._recent = {order_id: when for order_id, when in self._recent.items() if when >= cutoff}
+
+    def _apply_cancellations(self, db: Session) -> None:
+        events = db.execute(
+            select(OutboxEvent.id, OutboxEvent.payload)
+            .where(OutboxEvent.event_type == ORDER_CANCELLED, OutboxEvent.id > self._last_event_id)
+            .order_by(OutboxEvent.id)
+        ).all()
+        if not events:
+            return
+        self._last_event_id = events[-1].id
+        cancelled = np.array([event.payload["order_id"] for event in events], dtype=np.bytes_)
+        orders = np.flatnonzero(np.isin(self._order_ids, cancelled))
+        if len(orders):
+            # Copy: the current snapshot keeps its own active column
+            active = self._columns["active"].copy()
+            active[:self._size] &= ~np.isin(self._columns["order"][:self._size], orders)
+            self._columns["active"] = active
+            self._cancelled = True
+
+    def refresh(self) -> None:
+        """Load new orders and apply cancellations; called under the lock"""
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            if self._snapshot is None or time.monotonic() - self._refreshed_at >= settings.ANALYTICS_RELOAD_AFTER:
+                # Start over from order statuses: events up to now are reflected in
+                # them, and after a long gap `jobs purge` may have deleted some
+                self._reset()
+                self._last_event_id = db.scalar(
+                    select(func.coalesce(func.max(OutboxEvent.id), 0)).where(OutboxEvent.event_type == ORDER_CANCELLED)
+                )
+            else:
+                self._apply_cancellations(db)
+            self._load_orders(db)
+        finally:
+            db.close()
+        self.publish()
+        self.refreshes += 1
+        self.last_refresh_ms = (time.perf_counter() - started) * 1000
+
+    def publish(self) -> None:
+        """Make the appended lines and applied cancellations visible to queries"""
+        self._snapshot = _Snapshot(
+            self._size, self._columns,
+            {name: list(dictionary.values) for name, dictionary in self.dictionaries.items()},
+            dict(self._ranges), self._cancelled, datetime.utcnow(),
+        )
+        self._refreshed_at = time.monotonic()
+
+    def snapshot(self) -> _Snapshot:
+        """The current data, refreshed first if it is older than ANALYTICS_REFRESH_INTERVAL"""
+        stale = time.monotonic() - self._refreshed_at >= settings.ANALYTICS_REFRESH_INTERVAL
+        if self._snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self.refresh()
+        elif stale and self._lock.acquire(blocking=False):
+            # Other requests keep reading the previous snapshot meanwhile
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Analytics refresh failed")
+            finally:
+                self._lock.release()
+        return self._snapshot
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "lines": self._size,
+            "orders": len(self._order_ids),
+            "bytes": sum(column.nbytes for column in self._columns.values()) + self._order_ids.nbytes,
+            "watermark": self._watermark,
+            "refreshes": self.refreshes,
+            "last_refresh_ms": round(self.last_refresh_ms, 2),
+        }
+
+
+analytics_store = AnalyticsStore()
+
+
+def _group_codes(snapshot: _Snapshot, dimension: str) -> Tuple[np.ndarray, List[Optional[str]]]:
+    """Group code of every line, and the label of each code"""
+    column = snapshot.columns[dimension]
+    if dimension in TEXT_DIMENSIONS:
+        return column.astype(np.intp), snapshot.labels[dimension]
+    if dimension == "hour":
+        return column.astype(np.intp), [f"{hour:02d}" for hour in range(24)]
+    if dimension == "weekday":
+        return column.astype(np.intp), list(WEEKDAYS)
+    first, last = snapshot.ranges.get(dimension, (0, -1))
+    codes = np.subtract(column, first, dtype=np.intp)
+    if dimension == "day":
+        return codes, [(date(1970, 1, 1) + timedelta(days=day)).isoformat() for day in range(first, last + 1)]
+    return codes, [f"{1970 + month // 12}-{month % 12 + 1:02d}" for month in range(first, last + 1)]
+
+
+def run_query(
+    dimension: str,
+    metrics: Sequence[str],
+    sort: Optional[str] = None,
+    limit: int = 20,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    store: AnalyticsStore = analytics_store,
+) -> Dict[str, Any]:
+    """
+    Group the order lines with date_order in [start, end) by a dimension and
+    sum the metrics. Rows are the `limit` largest by `sort`, or in key order
+    for a time dimension without `sort`.
+    """
+    if dimension not in DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"dimension must be one of {', '.join(DIMENSIONS)}")
+    unknown = [metric for metric in metrics if metric not in METRICS]
+    if unknown or not metrics:
+        raise HTTPException(status_code=400, detail=f"metrics must be a comma-separated subset of {', '.join(METRICS)}")
+    if sort is None and dimension in TEXT_DIMENSIONS:
+        sort = metrics[0]
+    if sort is not None and sort not in metrics:
+        raise HTTPException(status_code=400, detail="sort must be one of the requested metrics")
+
+    snapshot = store.snapshot()
+    columns = snapshot.columns
+    codes, labels = _group_codes(snapshot, dimension)
+    size = len(labels)
+
+    # Lines outside the selection go to an extra bucket `size`, dropped below,
+    # so every metric is one bincount over whole columns without copying them
+    mask = None
+    if snapshot.cancelled:
+        mask = columns["active"].copy()
+    if start is not None or end is not None:
+        ts = columns["ts"]
+        in_range = ts >= _seconds(start) if start is not None else np.ones(snapshot.size, dtype=np.bool_)
+        if end is not None:
+            in_range &= ts < _seconds(end)
+        mask = in_range if mask is None else mask & in_range
+    if mask is not None:
+        codes[~mask] = size
+
+    values: Dict[str, np.ndarray] = {}
+    for metric in metrics:
+        if metric == "lines":
+            values[metric] = np.bincount(codes, minlength=size + 1)[:size]
+        elif metric in ("revenue", "units"):
+            weights = columns["revenue" if metric == "revenue" else "quantity"]
+            values[metric] = np.bincount(codes, weights=weights, minlength=size + 1)[:size]
+        else:
+            # An order counts once per group: once per distinct product/category among
+            # its lines, once overall for order-level dimensions
+            first = columns[f"first_{dimension}" if dimension in LINE_DIMENSIONS else "first_line"]
+            values[metric] = np.bincount(codes, weights=first, minlength=size + 1)[:size]
+    # Every group with lines has at least one order, so either count tells which groups exist
+    present = next((values[metric] for metric in ("lines", "orders") if metric in values), None)
+    if present is None:
+        present = np.bincount(codes, minlength=size + 1)[:size]
+
+    groups = np.flatnonzero(present)
+    if sort is not None:
+        key = values[sort][groups]
+        if limit < len(groups):
+            top = np.argpartition(-key, limit - 1)[:limit]
+            groups, key = groups[top], key[top]
+        groups = groups[np.argsort(-key, kind="stable")]
+    else:
+        groups = groups[:limit]
+
+    return {
+        "dimension": dimension,
+        "metrics": list(metrics),
+        "sort": sort,
+        "lines_scanned": snapshot.size if mask is None else int(np.count_nonzero(mask)),
+        "refreshed_at": snapshot.refreshed_at,
+        "rows": [
+            {
+                "key": labels[group],
+                **{metric: (float(values[metric][group]) if metric == "revenue" else int(values[metric][group]))
+                   for metric in metrics},
+            }
+            for group in groups
+        ],
+    }
@@ -1,18 +1,16 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
-from ..database import get_db
+from ..database import get_db, get_async_db
 from ..models.user import User
 from ..utils.security import decode_access_token
 
 security = HTTPBearer(auto_error=False)  # ← Don't throw error if no token
 
 
-def get_current_user(
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
-    db: Session = Depends(get_db)
-) -> Optional[User]:
+def _user_id_from_credentials(credentials: Optional[HTTPAuthorizationCredentials]) -> Optional[str]:
     # If no credentials provided, return None (anonymous user)
     if credentials is None:
         return None
@@ -34,14 +32,44 @@ def get_current_user(
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    return user_id
+
+
+def _user_not_found() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="User not found",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def get_current_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+    db: Session = Depends(get_db)
+) -> Optional[User]:
+    user_id = _user_id_from_credentials(credentials)
+    if user_id is None:
+        return None
     
     user = db.query(User).filter(User.id == user_id).first()  # ✅ Fixed: Use User.id
     if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise _user_not_found()
+    
+    return user
+
+
+async def get_current_user_async(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+) -> Optional[User]:
+    """Same as get_current_user, for async routes"""
+    user_id = _user_id_from_credentials(credentials)
+    if user_id is None:
+        return None
+    
+    user = await db.get(User, user_id)
+    if user is None:
+        raise _user_not_found()
     
     return user
 
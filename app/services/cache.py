@@ -0,0 +1,190 @@
+"""
+In-process TTL + LRU response cache for read-mostly catalog endpoints.
+
+Entries hold the already-rendered JSON body and its ETag, so a hit skips the
+database, the ORM and response serialization. The cache is bounded both by entry count
+and by total body bytes; least recently used entries are evicted first.
+"""
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .changes import on_change
+from ..utils.http import make_etag, etag_matches, not_modified
+
+
+class TTLCache:
+    def __init__(self, name: str, max_entries: int = 1024, max_bytes: int = 8 * 1024 * 1024, ttl: float = 300):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any, int]]" = OrderedDict()
+        self._by_namespace: Dict[str, Set[Hashable]] = defaultdict(set)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value, _ = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, size: int, ttl: Optional[float] = None) -> None:
+        """Store a value of `size` bytes; keys are tuples whose first element is the namespace"""
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + (ttl or self.ttl), value, size)
+            self._by_namespace[key[0]].add(key)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, namespace: str) -> None:
+        with self._lock:
+            for key in list(self._by_namespace.pop(namespace, ())):
+                self._remove(key)
+            self.invalidations += 1
+
+    def invalidate_where(self, namespace: str, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop the namespace's entries whose key matches; returns how many were dropped"""
+        with self._lock:
+            keys = [key for key in self._by_namespace.get(namespace, ()) if predicate(key)]
+            for key in keys:
+                self._remove(key)
+            self.invalidations += 1
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_namespace.clear()
+            self._bytes = 0
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+        namespace_keys = self._by_namespace.get(key[0])
+        if namespace_keys is not None:
+            namespace_keys.discard(key)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+catalog_cache = TTLCache("catalog")
+
+
+def cached(
+    namespace: str,
+    response_model: Any,
+    ttl: Optional[float] = None,
+    cache_control: str = "public, max-age=300",
+    cache: TTLCache = catalog_cache,
+):
+    """
+    Cache a GET route's rendered JSON response together with its ETag.
+
+    The key is the namespace plus the route's query parameters (the database
+    session and request are ignored). The route may return ORM objects; they
+    are validated against response_model once, on a miss. A request whose
+    If-None-Match matches the cached ETag gets an empty 304.
+    """
+    adapter = TypeAdapter(response_model)
+
+    def decorator(fn):
+        signature = inspect.signature(fn)
+        wants_request = "request" in signature.parameters
+
+        def lookup(kwargs):
+            request = kwargs["request"] if wants_request else kwargs.pop("request")
+            params = tuple(sorted(
+                (name, value) for name, value in kwargs.items()
+                if not isinstance(value, (Session, AsyncSession, Request))
+            ))
+            key = (namespace, params)
+            return request, key, cache.get(key)
+
+        def store(key, result):
+            data = adapter.validate_python(result, from_attributes=True)
+            body = adapter.dump_json(data, by_alias=True)
+            entry = (make_etag(body), body)
+            cache.set(key, entry, len(body), ttl)
+            return entry
+
+        def respond(request, entry):
+            etag, body = entry
+            headers = {"ETag": etag, "Cache-Control": cache_control}
+            if etag_matches(request, etag):
+                return not_modified(headers)
+            return Response(content=body, media_type="application/json", headers=headers)
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                request, key, entry = lookup(kwargs)
+                if entry is None:
+                    entry = store(key, await fn(*args, **kwargs))
+                return respond(request, entry)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                request, key, entry = lookup(kwargs)
+                if entry is None:
+                    entry = store(key, fn(*args, **kwargs))
+                return respond(request, entry)
+
+        # FastAPI must inject the Request even when the route itself doesn't take it
+        if not wants_request:
+            wrapper.__signature__ = signature.replace(parameters=[
+                *signature.parameters.values(),
+                inspect.Parameter("request", inspect.Parameter.KEYWORD_ONLY, annotation=Request),
+            ])
+        return wrapper
+    return decorator
+
+
+def invalidate_on(namespace: str, *models: type, cache: TTLCache = catalog_cache) -> None:
+    """Drop every cached response of the namespace after a commit touching any of the models"""
+    @on_change(*models)
+    def _invalidate(model, ids):
+        cache.invalidate(namespace)
+    _invalidate.__name__ = f"invalidate_{namespace}"
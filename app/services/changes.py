@@ -0,0 +1,63 @@
+"""
+Post-commit change notifications.
+
+In-process derived data (response caches, ranking lists, ...) registers a
+callback per model class. Rows added, modified or deleted through the ORM are
+collected on flush and the callbacks run once the transaction commits, so
+readers never see derived data that is ahead of the database.
+Code that changes rows with bulk UPDATE statements calls mark_changed().
+"""
+import logging
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+ChangeListener = Callable[[type, Set[str]], None]
+
+_listeners: Dict[type, List[ChangeListener]] = defaultdict(list)
+
+_PENDING_KEY = "changed_rows"
+
+
+def on_change(*models: type):
+    """Decorator: call fn(model, ids) after a commit that touched rows of any of the models"""
+    def decorator(fn: ChangeListener) -> ChangeListener:
+        for model in models:
+            _listeners[model].append(fn)
+        return fn
+    return decorator
+
+
+def mark_changed(session: Session, model: type, ids: Iterable[str]) -> None:
+    """Record rows changed outside the unit of work (bulk UPDATE/INSERT)"""
+    session.info.setdefault(_PENDING_KEY, defaultdict(set))[model].update(ids)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        model = type(obj)
+        if model in _listeners:
+            mark_changed(session, model, [getattr(obj, "id", None)])
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_changes(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    for model, ids in pending.items():
+        for listener in _listeners.get(model, []):
+            try:
+                listener(model, ids)
+            except Exception:
+                logger.exception("Change listener %s failed for %s", listener.__name__, model.__name__)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,89 @@
+"""
+Facet counts for product listings.
+
+All facets are computed from one grouped query over the products that match
+the non-facet filters (status, search text, min/max price). The query returns
+one row per (category, price bucket, material) combination present in the
+catalog; the count for each facet value is then summed from those cells
+applying every *other* facet's selection, so selecting a material still shows
+how many products each alternative material would give.
+"""
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Select, case, func
+
+from ..models.product import Product
+
+# Same labels as the price options served by GET /filters
+PRICE_BUCKETS: List[Tuple[str, Optional[float], Optional[float]]] = [
+    ("Under $100", None, 100),
+    ("$100-$500", 100, 500),
+    ("$500-$1000", 500, 1000),
+    ("Over $1000", 1000, None),
+]
+
+FACETS = ("category_id", "price", "material")
+
+material_type = Product.material["type"].as_string()
+
+price_bucket = case(
+    *[
+        (Product.current_price < upper, label)
+        for label, _, upper in PRICE_BUCKETS if upper is not None
+    ],
+    else_=PRICE_BUCKETS[-1][0],
+)
+
+
+def price_bucket_filter(label: str):
+    """SQL condition for one of the PRICE_BUCKETS labels, or None if the label is unknown"""
+    for bucket_label, lower, upper in PRICE_BUCKETS:
+        if bucket_label == label:
+            conditions = []
+            if lower is not None:
+                conditions.append(Product.current_price >= lower)
+            if upper is not None:
+                conditions.append(Product.current_price < upper)
+            return conditions
+    return None
+
+
+def facet_query(base: Select) -> Select:
+    """
+    Grouped (category_id, price bucket, material, count) cells for the products
+    of base, which must be filtered by everything except the facets.
+    """
+    bucket = price_bucket.label("price_bucket")
+    material = material_type.label("material_type")
+    return base.with_only_columns(
+        Product.category_id, bucket, material, func.count(Product.id)
+    ).group_by(Product.category_id, bucket, material).order_by(None)
+
+
+def summarize_facets(cells, selected: Dict[str, Optional[str]]) -> Tuple[int, Dict[str, List[dict]]]:
+    """
+    Return (total, facets) from the rows of facet_query;
+    selected maps facet name -> selected value (or None).
+    """
+    counts: Dict[str, Dict[str, int]] = {facet: {} for facet in FACETS}
+    total = 0
+    for category_id, bucket_value, material_value, count in cells:
+        values = {"category_id": category_id, "price": bucket_value, "material": material_value}
+        mismatched = [facet for facet in FACETS if selected.get(facet) and values[facet] != selected[facet]]
+        if not mismatched:
+            total += count
+        for facet in FACETS:
+            # A cell counts for a facet value if it matches all the other facets' selections
+            if values[facet] is None or [f for f in mismatched if f != facet]:
+                continue
+            counts[facet][values[facet]] = counts[facet].get(values[facet], 0) + count
+
+    price_order = {label: i for i, (label, _, _) in enumerate(PRICE_BUCKETS)}
+    facets = {}
+    for facet, value_counts in counts.items():
+        if facet == "price":
+            ordered = sorted(value_counts.items(), key=lambda kv: price_order[kv[0]])
+        else:
+            ordered = sorted(value_counts.items(), key=lambda kv: (-kv[1], kv[0]))
+        facets[facet] = [{"value": value, "count": count} for value, count in ordered]
+    return total, facets
@@ -0,0 +1,90 @@
+"""
+Worker id leases for the time-ordered ids of utils.helpers.
+
+An id is only unique if no two running processes share its 10 bit worker
+id, across hosts and uvicorn workers alike, so each process leases one
+from the id_worker_leases table. Taking a free id is an INSERT on the
+primary key and taking over an expired one is a conditional UPDATE, so two
+processes can never both win the same id. The holder renews its lease
+well before it expires and releases it on shutdown; the lease of a process
+that died is free again after ID_WORKER_LEASE_TTL.
+"""
+import os
+import random
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models.id_lease import IdWorkerLease
+
+LEASE_ATTEMPTS = 10
+
+
+def lease_owner() -> str:
+    """Identifies this process in id_worker_leases"""
+    return f"{socket.gethostname()[:60]}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def lease_worker_id(db: Session, owner: str, ttl: float, worker_ids: int) -> int:
+    """Claim a worker id below worker_ids that no live process holds"""
+    table = IdWorkerLease.__table__
+    for _ in range(LEASE_ATTEMPTS):
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=ttl)
+        held = dict(db.execute(select(table.c.worker_id, table.c.expires_at)).all())
+        free = [worker_id for worker_id in range(worker_ids) if worker_id not in held]
+        if free:
+            # Random, so processes starting together rarely race for the same id
+            worker_id = random.choice(free)
+            db.add(IdWorkerLease(worker_id=worker_id, owner=owner, expires_at=expires_at))
+            try:
+                db.commit()
+                return worker_id
+            except IntegrityError:
+                db.rollback()
+                continue
+        expired = [worker_id for worker_id, until in held.items() if until < now and worker_id < worker_ids]
+        random.shuffle(expired)
+        for worker_id in expired:
+            # Only one process takes over an expired lease
+            result = db.execute(
+                update(table)
+                .where(table.c.worker_id == worker_id, table.c.expires_at < now)
+                .values(owner=owner, expires_at=expires_at)
+            )
+            if result.rowcount == 1:
+                db.commit()
+                return worker_id
+        db.rollback()
+        if not expired:
+            raise RuntimeError(f"All {worker_ids} id worker ids are leased by running processes")
+    raise RuntimeError("Could not lease an id worker id")
+
+
+def renew_worker_id(db: Session, worker_id: int, owner: str, ttl: float) -> Optional[datetime]:
+    """Extend our lease; None if it was lost (expired and taken by another process)"""
+    table = IdWorkerLease.__table__
+    expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+    result = db.execute(
+        update(table)
+        .where(table.c.worker_id == worker_id, table.c.owner == owner)
+        .values(expires_at=expires_at)
+    )
+    db.commit()
+    return expires_at if result.rowcount == 1 else None
+
+
+def release_worker_id(db: Session, worker_id: int, owner: str) -> None:
+    """Make our worker id free for the next process right away"""
+    table = IdWorkerLease.__table__
+    db.execute(
+        update(table)
+        .where(table.c.worker_id == worker_id, table.c.owner == owner)
+        .values(expires_at=datetime.utcnow())
+    )
+    db.commit()
@@ -0,0 +1,286 @@
+"""
+Idempotency-Key support for mutating endpoints.
+
+A client that retries a POST sends the same Idempotency-Key header. The first
+request with a key runs the route and its rendered response is stored; a
+replay within IDEMPOTENCY_TTL gets the stored status and body back without
+running the route again.
+
+Keys are rows of idempotency_keys, so every worker process, and a process
+started after a restart or deploy, recognizes a retry. A key is claimed
+with an INSERT in the route's own transaction before the route runs, so the
+claim commits together with the order (cart item, stock movement) the route
+writes, or not at all: a request that fails before its commit (any
+exception, including HTTP errors) leaves no claim and the client can retry.
+A duplicate sent while the first request runs waits on the key's row lock
+(MySQL) and then for the stored response; 409 if none comes within
+wait_timeout. Expired keys are reused and, every
+IDEMPOTENCY_PURGE_INTERVAL seconds, deleted.
+
+Keys are scoped to the route and the authenticated user, and bound to the
+request body: reusing a key with a different body is rejected with 422.
+"""
+import functools
+import hashlib
+import inspect
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+import anyio
+from fastapi import Header, HTTPException, Request, Response
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.idempotency import IdempotencyKey, IdempotencyStatus
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+CLAIM_ATTEMPTS = 5
+POLL_INTERVAL = 0.05   # Seconds between checks for the response of an in-flight duplicate
+
+# (namespace, user id, Idempotency-Key)
+Key = Tuple[str, str, str]
+
+
+class IdempotencyStore:
+    def __init__(self, ttl: float, purge_interval: float):
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0   # time.monotonic()
+        self.replays = 0
+        self.waits = 0
+        self.conflicts = 0
+        self.purged = 0
+
+    @staticmethod
+    def _where(key: Key):
+        table = IdempotencyKey.__table__
+        namespace, user_id, idempotency_key = key
+        return (table.c.namespace == namespace, table.c.user_id == user_id, table.c.idempotency_key == idempotency_key)
+
+    def claim(self, db: Session, key: Key, fingerprint: str) -> Tuple[bool, Optional[Tuple[int, bytes]]]:
+        """
+        (True, None): the key is claimed in db's transaction and the caller
+        runs the request, whose commit commits the claim. (False, response):
+        the stored response of an earlier request, or None while that one is
+        still running.
+        """
+        table = IdempotencyKey.__table__
+        where = self._where(key)
+        for _ in range(CLAIM_ATTEMPTS):
+            now = datetime.utcnow()
+            claim = {
+                "fingerprint": fingerprint,
+                "status": IdempotencyStatus.in_progress.value,
+                "status_code": None,
+                "response_body": None,
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=self.ttl),
+            }
+            row = db.execute(
+                select(table.c.fingerprint, table.c.status, table.c.status_code,
+                       table.c.response_body, table.c.expires_at).where(*where)
+            ).first()
+            try:
+                if row is None:
+                    namespace, user_id, idempotency_key = key
+                    db.execute(insert(table).values(
+                        namespace=namespace, user_id=user_id, idempotency_key=idempotency_key, **claim
+                    ))
+                    return True, None
+                if row.expires_at <= now:
+                    # Conditional, so only one request takes over an expired key
+                    result = db.execute(update(table).where(*where, table.c.expires_at <= now).values(**claim))
+                    if result.rowcount == 1:
+                        return True, None
+                    db.rollback()
+                    continue
+            except IntegrityError:
+                # Claimed by another request meanwhile; on MySQL the INSERT waited for it to commit
+                db.rollback()
+                continue
+            db.rollback()
+            if row.fingerprint != fingerprint:
+                self.conflicts += 1
+                raise HTTPException(status_code=422, detail=f"{IDEMPOTENCY_HEADER} was already used with a different request")
+            if row.status == IdempotencyStatus.completed.value:
+                self.replays += 1
+                return False, (row.status_code, row.response_body)
+            return False, None
+        return False, None
+
+    def complete(self, db: Session, key: Key, status_code: int, body: bytes) -> None:
+        """Store the response of a request whose route has committed"""
+        db.execute(
+            update(IdempotencyKey.__table__).where(*self._where(key)).values(
+                status=IdempotencyStatus.completed.value, status_code=status_code, response_body=body,
+                expires_at=datetime.utcnow() + timedelta(seconds=self.ttl),
+            )
+        )
+        db.commit()
+        if time.monotonic() >= self._next_purge:
+            self._next_purge = time.monotonic() + self.purge_interval
+            try:
+                self.purge_expired(db)
+            except Exception:
+                db.rollback()
+                logger.exception("Purging expired idempotency keys failed")
+
+    def purge_expired(self, db: Session) -> int:
+        table = IdempotencyKey.__table__
+        result = db.execute(table.delete().where(table.c.expires_at < datetime.utcnow()))
+        db.commit()
+        self.purged += result.rowcount
+        return result.rowcount
+
+    def stats(self, db: Session) -> Dict[str, Any]:
+        table = IdempotencyKey.__table__
+        return {
+            "entries": db.scalar(select(func.count()).select_from(table).where(table.c.expires_at > datetime.utcnow())),
+            "ttl": self.ttl,
+            "replays": self.replays,
+            "waits": self.waits,
+            "conflicts": self.conflicts,
+            "purged": self.purged,
+        }
+
+
+idempotency_store = IdempotencyStore(settings.IDEMPOTENCY_TTL, settings.IDEMPOTENCY_PURGE_INTERVAL)
+
+
+def _fingerprint(kwargs: Dict[str, Any]) -> str:
+    digest = hashlib.sha1()
+    for name, value in sorted(kwargs.items()):
+        if isinstance(value, BaseModel):
+            digest.update(name.encode())
+            digest.update(value.model_dump_json().encode())
+        elif isinstance(value, (str, int, float, bool)) or value is None:
+            digest.update(f"{name}={value!r}".encode())
+    return digest.hexdigest()
+
+
+def idempotent(
+    namespace: str,
+    response_model: Any,
+    status_code: int = 200,
+    wait_timeout: float = 30,
+    store: IdempotencyStore = idempotency_store,
+):
+    """
+    Make a POST route honour the Idempotency-Key header. Without the header
+    the route runs as before. The route's result is validated against
+    response_model and rendered once; replays return the same bytes.
+    """
+    adapter = TypeAdapter(response_model)
+
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        def prepare(kwargs):
+            # Absent when the route is called directly rather than through FastAPI
+            idempotency_key = kwargs.pop("idempotency_key", None)
+            if not idempotency_key:
+                return None
+            if len(idempotency_key) > MAX_KEY_LENGTH:
+                raise HTTPException(status_code=400, detail=f"{IDEMPOTENCY_HEADER} is too long")
+            db = next((value for value in kwargs.values() if isinstance(value, (Session, AsyncSession))), None)
+            if db is None:
+                raise TypeError(f"@idempotent route {fn.__name__} needs a database session argument")
+            user = kwargs.get("current_user")
+            key = (namespace, getattr(user, "id", None) or "", idempotency_key)
+            fingerprint = _fingerprint({
+                name: value for name, value in kwargs.items()
+                if not isinstance(value, (Session, AsyncSession, Request)) and name != "current_user"
+            })
+            return key, fingerprint, db
+
+        def render(result) -> bytes:
+            if isinstance(result, Response):
+                return result.body
+            return adapter.dump_json(adapter.validate_python(result, from_attributes=True), by_alias=True)
+
+        def respond(stored: Tuple[int, bytes], replayed: bool) -> Response:
+            code, body = stored
+            headers = {REPLAYED_HEADER: "true"} if replayed else {}
+            return Response(content=body, status_code=code, media_type="application/json", headers=headers)
+
+        def timed_out():
+            return HTTPException(status_code=409, detail=f"A request with this {IDEMPOTENCY_HEADER} is still in progress")
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                prepared = prepare(kwargs)
+                if prepared is None:
+                    return await fn(*args, **kwargs)
+                key, fingerprint, db = prepared
+                deadline = None
+                while True:
+                    owner, stored = await db.run_sync(store.claim, key, fingerprint)
+                    if owner:
+                        break
+                    if stored is not None:
+                        return respond(stored, replayed=True)
+                    if deadline is None:
+                        store.waits += 1
+                        deadline = time.monotonic() + wait_timeout
+                    elif time.monotonic() >= deadline:
+                        raise timed_out()
+                    await anyio.sleep(POLL_INTERVAL)
+                try:
+                    body = render(await fn(*args, **kwargs))
+                except BaseException:
+                    # Drops the claim unless the route committed before failing
+                    await db.rollback()
+                    raise
+                await db.run_sync(store.complete, key, status_code, body)
+                return respond((status_code, body), replayed=False)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                prepared = prepare(kwargs)
+                if prepared is None:
+                    return fn(*args, **kwargs)
+                key, fingerprint, db = prepared
+                deadline = None
+                while True:
+                    owner, stored = store.claim(db, key, fingerprint)
+                    if owner:
+                        break
+                    if stored is not None:
+                        return respond(stored, replayed=True)
+                    if deadline is None:
+                        store.waits += 1
+                        deadline = time.monotonic() + wait_timeout
+                    elif time.monotonic() >= deadline:
+                        raise timed_out()
+                    # Sync routes run in the threadpool, so blocking here is fine
+                    time.sleep(POLL_INTERVAL)
+                try:
+                    body = render(fn(*args, **kwargs))
+                except BaseException:
+                    # Drops the claim unless the route committed before failing
+                    db.rollback()
+                    raise
+                store.complete(db, key, status_code, body)
+                return respond((status_code, body), replayed=False)
+
+        # FastAPI reads the header and passes it to the wrapper, not the route
+        wrapper.__signature__ = signature.replace(parameters=[
+            *signature.parameters.values(),
+            inspect.Parameter(
+                "idempotency_key", inspect.Parameter.KEYWORD_ONLY,
+                default=Header(None, alias=IDEMPOTENCY_HEADER), annotation=Optional[str],
+            ),
+        ])
+        return wrapper
+    return decorator
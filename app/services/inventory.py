@@ -0,0 +1,126 @@
+"""
+Stock reservations for orders.
+
+Checkout moves the ordered quantity into inventory.quantity_reserved with a
+conditional UPDATE that only succeeds while enough stock is available, so
+concurrent checkouts can't sell the same unit twice and no row is locked
+longer than that one statement. Cancelling an order releases its
+reservation; delivering it turns the reservation into an export_stock
+transaction. Products without an inventory row are not stock-tracked and are
+never reserved.
+
+order_items.reserved_quantity records what each line actually reserved, so
+release and commit undo exactly that, at most once.
+"""
+from collections import Counter
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from ..models.inventory import Inventory, InventoryTransaction, TransactionType
+from ..models.order import OrderItem
+from ..utils.helpers import generate_id
+from .changes import mark_changed
+
+inventory_table = Inventory.__table__
+order_items = OrderItem.__table__
+
+
+def reserve_stock(db: Session, items: List[dict]) -> None:
+    """
+    Reserve stock for order item rows (dicts with product_id and quantity)
+    before they are inserted; sets each row's reserved_quantity.
+    Raises 400 for a non-positive quantity (it would release other orders'
+    reservations) and 409 if any tracked product doesn't have enough
+    available stock; the caller's transaction must then be rolled back.
+    """
+    quantities: Dict[str, int] = Counter()
+    for item in items:
+        if item["quantity"] <= 0:
+            raise HTTPException(status_code=400, detail=f"Quantity must be positive for product {item['product_id']}")
+        quantities[item["product_id"]] += item["quantity"]
+    tracked = set(db.scalars(
+        select(Inventory.product_id).where(Inventory.product_id.in_(quantities))
+    ).all()) if quantities else set()
+
+    # Id order: concurrent checkouts take row locks in the same order
+    for product_id in sorted(tracked):
+        quantity = quantities[product_id]
+        result = db.execute(
+            update(inventory_table)
+            .where(
+                inventory_table.c.product_id == product_id,
+                inventory_table.c.quantity_on_hand - inventory_table.c.quantity_reserved >= quantity,
+            )
+            .values(quantity_reserved=inventory_table.c.quantity_reserved + quantity)
+        )
+        if result.rowcount != 1:
+            raise HTTPException(status_code=409, detail=f"Insufficient stock for product {product_id}")
+    mark_changed(db, Inventory, tracked)
+
+    for item in items:
+        item["reserved_quantity"] = item["quantity"] if item["product_id"] in tracked else 0
+
+
+def _take_reservations(db: Session, order_id: str) -> Dict[str, int]:
+    # Reserved quantity per product; zeroed so the reservation is only used once
+    rows = db.execute(
+        select(order_items.c.product_id, order_items.c.reserved_quantity)
+        .where(order_items.c.order_id == order_id, order_items.c.reserved_quantity > 0)
+    ).all()
+    reserved: Dict[str, int] = Counter()
+    for product_id, quantity in rows:
+        reserved[product_id] += quantity
+    if reserved:
+        db.execute(
+            update(order_items)
+            .where(order_items.c.order_id == order_id, order_items.c.reserved_quantity > 0)
+            .values(reserved_quantity=0)
+        )
+    return reserved
+
+
+def release_stock(db: Session, order_id: str) -> None:
+    """Give an order's reserved quantities back (order cancelled)"""
+    reserved = _take_reservations(db, order_id)
+    for product_id, quantity in sorted(reserved.items()):
+        db.execute(
+            update(inventory_table)
+            .where(inventory_table.c.product_id == product_id)
+            .values(quantity_reserved=inventory_table.c.quantity_reserved - quantity)
+        )
+    mark_changed(db, Inventory, reserved)
+
+
+def commit_stock(db: Session, order_id: str, user_id: Optional[str] = None) -> None:
+    """Ship an order's reserved quantities: they leave on-hand stock as export_stock transactions"""
+    reserved = _take_reservations(db, order_id)
+    if not reserved:
+        return
+    inventory_ids = dict(db.execute(
+        select(Inventory.product_id, Inventory.id).where(Inventory.product_id.in_(reserved))
+    ).all())
+    for product_id, quantity in sorted(reserved.items()):
+        db.execute(
+            update(inventory_table)
+            .where(inventory_table.c.product_id == product_id)
+            .values(
+                quantity_on_hand=inventory_table.c.quantity_on_hand - quantity,
+                quantity_reserved=inventory_table.c.quantity_reserved - quantity,
+            )
+        )
+        mark_changed(db, Inventory, [product_id])
+        if product_id not in inventory_ids:
+            continue
+        db.add(InventoryTransaction(
+            id=generate_id("TRX"),
+            inventory_id=inventory_ids[product_id],
+            product_id=product_id,
+            transaction_type=TransactionType.export_stock,
+            quantity=-quantity,
+            reference_number=order_id,
+            note="Order delivered",
+            created_by=user_id,
+        ))
@@ -0,0 +1,289 @@
+"""
+Background jobs fed by a durable outbox.
+
+Request handlers call enqueue() to add an OutboxEvent in the same transaction
+as their own writes and return as soon as they commit. A pool of worker
+threads claims due events in batches, hands each event type's payloads to
+its handler in one call, and marks the events processed in the same
+transaction as the handler's writes, so an event is applied exactly once or
+not at all. If a batch fails, its events are run one at a time so only the
+ones that raise are retried, with exponential backoff, and marked failed
+after JOB_MAX_ATTEMPTS. The failed attempt and its backoff are written in
+the transaction that releases the claim, so no worker can pick the event up
+again before it is due.
+
+On MySQL, rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so
+several workers (and several uvicorn processes) can share the table.
+Workers are woken right after a commit that enqueued events, and poll every
+JOB_POLL_INTERVAL seconds for events enqueued by other processes or due
+for retry.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models.outbox import OutboxEvent, OutboxStatus
+from .changes import on_change
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Session, List[Dict[str, Any]]], None]
+
+_handlers: Dict[str, JobHandler] = {}
+
+# Backoff before retry n (1-based): JOB_RETRY_DELAY * 2 ** (n - 1) seconds
+JOB_RETRY_DELAY = 2
+MAX_ERROR_LENGTH = 2000
+
+
+def job_handler(event_type: str):
+    """Decorator: fn(db, payloads) applies a batch of events of one type; it must not commit"""
+    def decorator(fn: JobHandler) -> JobHandler:
+        _handlers[event_type] = fn
+        return fn
+    return decorator
+
+
+def enqueue(db: Session, event_type: str, payload: Dict[str, Any]) -> None:
+    """Queue a job; it runs only if the caller's transaction commits"""
+    if event_type not in _handlers:
+        raise ValueError(f"No job handler for {event_type}")
+    db.add(OutboxEvent(event_type=event_type, payload=payload))
+
+
+class JobStats:
+    def __init__(self):
+        self.batches = 0
+        self.processed = 0
+        self.retried = 0
+        self.failed = 0
+        self.last_batch_ms = 0.0
+        self.max_lag_seconds = 0.0   # Enqueue to processing, worst seen by this process
+        self._lock = threading.Lock()
+
+    def record_batch(self, events: List[OutboxEvent], elapsed_ms: float) -> None:
+        now = datetime.utcnow()
+        lag = max((now - event.created_at).total_seconds() for event in events)
+        with self._lock:
+            self.batches += 1
+            self.processed += len(events)
+            self.last_batch_ms = elapsed_ms
+            self.max_lag_seconds = max(self.max_lag_seconds, lag)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "processed": self.processed,
+            "retried": self.retried,
+            "failed": self.failed,
+            "last_batch_ms": round(self.last_batch_ms, 2),
+            "max_lag_seconds": round(self.max_lag_seconds, 3),
+        }
+
+
+job_stats = JobStats()
+
+
+def _claim(db: Session, limit: int) -> List[OutboxEvent]:
+    query = db.query(OutboxEvent).filter(
+        OutboxEvent.status == OutboxStatus.pending.value,
+        OutboxEvent.available_at <= datetime.utcnow(),
+    ).order_by(OutboxEvent.id).limit(limit)
+    return query.with_for_update(skip_locked=True).all()
+
+
+def _run_batch(db: Session, events: List[OutboxEvent]) -> None:
+    payloads: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for event in events:
+        payloads[event.event_type].append(event.payload)
+    for event_type, batch in payloads.items():
+        handler = _handlers.get(event_type)
+        if handler is None:
+            raise LookupError(f"No job handler for {event_type}")
+        handler(db, batch)
+    db.execute(
+        update(OutboxEvent.__table__)
+        .where(OutboxEvent.__table__.c.id.in_([event.id for event in events]))
+        .values(status=OutboxStatus.processed.value, processed_at=datetime.utcnow())
+    )
+
+
+def _run_isolated(db: Session, events: List[OutboxEvent]) -> Dict[int, Exception]:
+    """
+    Run the batch in a savepoint; if it fails, run each event in its own
+    savepoint. Returns the errors of the events that failed, by event id.
+    """
+    try:
+        with db.begin_nested():
+            _run_batch(db, events)
+        return {}
+    except Exception:
+        logger.exception("Job batch %s failed, running its events one at a time", [event.id for event in events])
+    failures: Dict[int, Exception] = {}
+    for event in events:
+        try:
+            with db.begin_nested():
+                _run_batch(db, [event])
+        except Exception as e:
+            logger.exception("Job event %s failed", event.id)
+            failures[event.id] = e
+    return failures
+
+
+def _record_failures(db: Session, events: List[OutboxEvent], failures: Dict[int, Exception]) -> None:
+    """Count a failed attempt on the (claimed) events and schedule their retry; the caller commits"""
+    now = datetime.utcnow()
+    for event in events:
+        if event.id not in failures:
+            continue
+        error = failures[event.id]
+        event.attempts += 1
+        event.last_error = f"{type(error).__name__}: {error}"[:MAX_ERROR_LENGTH]
+        if event.attempts >= settings.JOB_MAX_ATTEMPTS:
+            event.status = OutboxStatus.failed.value
+            job_stats.failed += 1
+        else:
+            event.available_at = now + timedelta(seconds=JOB_RETRY_DELAY * 2 ** (event.attempts - 1))
+            job_stats.retried += 1
+
+
+def _reclaim_for_retry(db: Session, event_ids: List[int], error: Exception) -> None:
+    """
+    Record a failed attempt for a batch whose transaction was lost. The
+    rollback released the claim, so events another worker has claimed or
+    finished since are left to it.
+    """
+    events = db.query(OutboxEvent).filter(
+        OutboxEvent.id.in_(event_ids),
+        OutboxEvent.status == OutboxStatus.pending.value,
+    ).with_for_update(skip_locked=True).all()
+    _record_failures(db, events, {event.id: error for event in events})
+    db.commit()
+
+
+def process_pending(limit: Optional[int] = None) -> int:
+    """Claim and run one batch of due events; returns how many were processed"""
+    db = SessionLocal()
+    try:
+        events = _claim(db, limit or settings.JOB_BATCH_SIZE)
+        if not events:
+            db.rollback()
+            return 0
+        event_ids = [event.id for event in events]
+        started = time.perf_counter()
+        try:
+            failures = _run_isolated(db, events)
+            done = [event for event in events if event.id not in failures]
+            _record_failures(db, events, failures)
+            db.commit()
+        except Exception as e:
+            # The transaction itself failed (connection lost, deadlock, ...)
+            logger.exception("Job batch %s failed", event_ids)
+            db.rollback()
+            _reclaim_for_retry(db, event_ids, e)
+            return 0
+        if done:
+            job_stats.record_batch(done, (time.perf_counter() - started) * 1000)
+        return len(done)
+    finally:
+        db.close()
+
+
+def retry_failed(db: Session) -> int:
+    """Put events that gave up back in the queue"""
+    result = db.execute(
+        update(OutboxEvent.__table__)
+        .where(OutboxEvent.__table__.c.status == OutboxStatus.failed.value)
+        .values(status=OutboxStatus.pending.value, attempts=0, available_at=datetime.utcnow())
+    )
+    db.commit()
+    return result.rowcount
+
+
+def purge_processed(db: Session, older_than: timedelta) -> int:
+    """Delete processed events older than the given age"""
+    table = OutboxEvent.__table__
+    result = db.execute(table.delete().where(
+        table.c.status == OutboxStatus.processed.value,
+        table.c.processed_at < datetime.utcnow() - older_than,
+    ))
+    db.commit()
+    return result.rowcount
+
+
+def queue_status(db: Session) -> Dict[str, Any]:
+    """Outbox depth and lag (shared by all processes) plus this process' worker counters"""
+    counts = dict(db.query(OutboxEvent.status, func.count(OutboxEvent.id)).group_by(OutboxEvent.status).all())
+    oldest = db.query(func.min(OutboxEvent.created_at)).filter(
+        OutboxEvent.status == OutboxStatus.pending.value
+    ).scalar()
+    return {
+        "depth": counts.get(OutboxStatus.pending.value, 0),
+        "failed": counts.get(OutboxStatus.failed.value, 0),
+        "lag_seconds": (datetime.utcnow() - oldest).total_seconds() if oldest else 0.0,
+        "workers": worker_pool.size if worker_pool.running else 0,
+        "stats": job_stats.as_dict(),
+    }
+
+
+class WorkerPool:
+    def __init__(self):
+        self.size = 0
+        self._threads: List[threading.Thread] = []
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._threads)
+
+    def start(self, size: int) -> None:
+        if self._threads or size <= 0:
+            return
+        # SQLite has no SKIP LOCKED: two workers could claim the same events
+        if settings.DATABASE_URL.startswith("sqlite"):
+            size = 1
+        self.size = size
+        self._stopping.clear()
+        for i in range(size):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 10) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                processed = process_pending()
+            except Exception:
+                logger.exception("Job worker failed to claim events")
+                processed = 0
+            if processed:
+                continue  # Keep draining while there is a backlog
+            self._wakeup.wait(settings.JOB_POLL_INTERVAL)
+            self._wakeup.clear()
+
+
+worker_pool = WorkerPool()
+
+
+@on_change(OutboxEvent)
+def _wake_workers(model, ids):
+    worker_pool.wake()
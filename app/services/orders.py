@@ -0,0 +1,67 @@
+"""
+Background side effects of placed and cancelled orders (run by services.jobs).
+"""
+from collections import Counter
+from typing import Any, Dict, List
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import Session
+
+from ..models.product import Product
+from .changes import mark_changed
+from .jobs import enqueue, job_handler
+from .sales import apply_orders_to_rollups
+
+ORDER_CREATED = "order_created"
+ORDER_CANCELLED = "order_cancelled"
+
+products = Product.__table__
+
+
+def enqueue_order_created(db: Session, order_id: str, items: List[Dict[str, Any]]) -> None:
+    """Queue the derived updates of a new order, in the order's transaction"""
+    quantities: Dict[str, int] = Counter()
+    for item in items:
+        quantities[item["product_id"]] += item["quantity"]
+    enqueue(db, ORDER_CREATED, {"order_id": order_id, "quantities": dict(quantities)})
+
+
+def enqueue_order_cancelled(db: Session, order_id: str) -> None:
+    """Queue the derived updates of a cancelled order, in the cancelling transaction"""
+    enqueue(db, ORDER_CANCELLED, {"order_id": order_id})
+
+
+@job_handler(ORDER_CREATED)
+def on_orders_created(db: Session, payloads: List[Dict[str, Any]]) -> None:
+    apply_order_sales(db, payloads)
+    apply_orders_to_rollups(db, [payload["order_id"] for payload in payloads], 1)
+
+
+@job_handler(ORDER_CANCELLED)
+def on_orders_cancelled(db: Session, payloads: List[Dict[str, Any]]) -> None:
+    apply_orders_to_rollups(db, [payload["order_id"] for payload in payloads], -1)
+
+
+def apply_order_sales(db: Session, payloads: List[Dict[str, Any]]) -> None:
+    """
+    Add the sold quantities of a batch of orders to Product.sell_count: one
+    IN query and one executemany UPDATE for the whole batch. The increments
+    are atomic and rows are updated in id order, so concurrent batches
+    neither lose updates nor deadlock.
+    """
+    quantities: Dict[str, int] = Counter()
+    for payload in payloads:
+        for product_id, quantity in payload["quantities"].items():
+            quantities[product_id] += quantity
+    if not quantities:
+        return
+    existing_ids = set(db.scalars(select(Product.id).where(Product.id.in_(quantities))).all())
+    if not existing_ids:
+        return
+    db.execute(
+        update(products)
+        .where(products.c.id == bindparam("product_key"))
+        .values(sell_count=products.c.sell_count + bindparam("quantity")),
+        [{"product_key": product_id, "quantity": quantities[product_id]} for product_id in sorted(existing_ids)],
+    )
+    mark_changed(db, Product, existing_ids)
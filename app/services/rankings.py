@@ -0,0 +1,171 @@
+"""
+Materialized top-N product rankings for the /products/special/* endpoints.
+
+Each ranking keeps the best RANKING_CAPACITY active products as a sorted
+(key, id) list in memory. Product changes committed through the ORM (or
+reported with changes.mark_changed) are queued and applied incrementally on
+the next read with a single primary-key lookup, so a request costs O(limit)
+instead of sorting the whole product table. Lists are rebuilt from the
+database when they run short or after RANKING_TTL seconds, which also picks
+up changes made by other worker processes.
+"""
+import bisect
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set
+
+from sqlalchemy import desc
+from sqlalchemy.orm import Session
+
+from ..models.product import Product, ProductStatus
+from .changes import on_change
+
+RANKING_CAPACITY = 100
+RANKING_TTL = 300
+
+_ROW_COLUMNS = (
+    Product.id, Product.status, Product.timestamp, Product.sell_count,
+    Product.review_avg, Product.root_price, Product.current_price,
+)
+
+
+def _is_active(row) -> bool:
+    return row.status in (ProductStatus.active, "active")
+
+
+class Ranking:
+    def __init__(self, name: str, key: Callable, order_by, eligible: Callable, where=None):
+        self.name = name
+        self.key = key              # row -> sort value (higher ranks first)
+        self.order_by = order_by    # SQL expression with the same ordering as key
+        self.eligible = eligible    # row -> bool
+        self.where = where          # SQL filter with the same meaning as eligible
+        self._entries: List[tuple] = []   # ascending (value, id); best entry last
+        self._values: Dict[str, tuple] = {}
+        self._complete = False      # True when every eligible product is in the list
+        self._loaded_at: Optional[float] = None
+
+    def query(self, db: Session, *entities):
+        query = db.query(*entities).filter(Product.status == ProductStatus.active)
+        if self.where is not None:
+            query = query.filter(self.where)
+        return query.order_by(desc(self.order_by), desc(Product.id))
+
+    def replace(self, rows) -> None:
+        self._entries = sorted((self.key(row), row.id) for row in rows)
+        self._values = {entry[1]: entry for entry in self._entries}
+        self._complete = len(rows) < RANKING_CAPACITY
+        self._loaded_at = time.monotonic()
+
+    def apply(self, product_id: str, row) -> None:
+        """
+        Re-rank one product; row is None when the product was deleted.
+        The list always stays a correct prefix of the full ranking: removing an
+        entry only shortens it, and a product outside a truncated list is only
+        inserted when it beats the current minimum.
+        """
+        old = self._values.pop(product_id, None)
+        if old is not None:
+            del self._entries[bisect.bisect_left(self._entries, old)]
+
+        if row is None or not _is_active(row) or not self.eligible(row):
+            return
+
+        entry = (self.key(row), product_id)
+        if not self._complete and (not self._entries or entry < self._entries[0]):
+            return
+        bisect.insort(self._entries, entry)
+        self._values[product_id] = entry
+        if len(self._entries) > RANKING_CAPACITY:
+            dropped = self._entries.pop(0)
+            del self._values[dropped[1]]
+            self._complete = False
+
+    def needs_reload(self, limit: int) -> bool:
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > RANKING_TTL:
+            return True
+        return not self._complete and len(self._entries) < limit
+
+    def top_ids(self, limit: int) -> List[str]:
+        return [product_id for _, product_id in reversed(self._entries[-limit:])] if limit > 0 else []
+
+
+RANKINGS: Dict[str, Ranking] = {
+    "new_arrivals": Ranking(
+        "new_arrivals",
+        key=lambda row: row.timestamp,
+        order_by=Product.timestamp,
+        eligible=lambda row: row.timestamp is not None,
+        where=Product.timestamp.isnot(None),
+    ),
+    "top_seller": Ranking(
+        "top_seller",
+        key=lambda row: row.sell_count or 0,
+        order_by=Product.sell_count,
+        eligible=lambda row: True,
+    ),
+    "best_review": Ranking(
+        "best_review",
+        key=lambda row: row.review_avg or 0,
+        order_by=Product.review_avg,
+        eligible=lambda row: True,
+    ),
+    "discount": Ranking(
+        "discount",
+        key=lambda row: (row.root_price or 0) - (row.current_price or 0),
+        order_by=Product.root_price - Product.current_price,
+        eligible=lambda row: (row.current_price or 0) < (row.root_price or 0),
+        where=Product.current_price < Product.root_price,
+    ),
+}
+
+# Guards the lists and the pending set. Never held during a query: async
+# routes run this code on the event loop thread via AsyncSession.run_sync.
+_lock = threading.Lock()
+_pending: Set[str] = set()
+
+
+@on_change(Product)
+def _queue_product_changes(model, ids):
+    with _lock:
+        _pending.update(i for i in ids if i is not None)
+
+
+def _apply_pending(db: Session) -> None:
+    global _pending
+    with _lock:
+        ids, _pending = _pending, set()
+    if not ids:
+        return
+    rows = {row.id: row for row in db.query(*_ROW_COLUMNS).filter(Product.id.in_(ids)).all()}
+    with _lock:
+        for ranking in RANKINGS.values():
+            for product_id in ids:
+                ranking.apply(product_id, rows.get(product_id))
+
+
+def top_product_ids(db: Session, name: str, limit: int) -> Optional[List[str]]:
+    """Ids of the best `limit` products of a ranking, or None if limit exceeds what is kept in memory"""
+    if limit > RANKING_CAPACITY:
+        return None
+    ranking = RANKINGS[name]
+    _apply_pending(db)
+    with _lock:
+        stale = ranking.needs_reload(limit)
+    if stale:
+        rows = ranking.query(db, *_ROW_COLUMNS).limit(RANKING_CAPACITY).all()
+        with _lock:
+            ranking.replace(rows)
+    with _lock:
+        return ranking.top_ids(limit)
+
+
+def top_products(db: Session, name: str, limit: int) -> List[Product]:
+    """Load the ranked products in rank order with one primary-key IN query"""
+    ids = top_product_ids(db, name, limit)
+    if ids is None:
+        return RANKINGS[name].query(db, Product).limit(limit).all()
+    if not ids:
+        return []
+    by_id = {p.id: p for p in db.query(Product).filter(Product.id.in_(ids)).all()}
+    return [by_id[i] for i in ids if i in by_id]
@@ -0,0 +1,86 @@
+"""
+Result cache for the admin reports.
+
+Entries hold the rendered JSON body and are keyed by report name and
+normalized parameters: from_date/to_date are reduced to the whole-day
+[first, last) bounds the report reads, so equivalent requests share an entry.
+Because keys carry those bounds, a commit that changes the sales rollups
+drops only the entries whose range covers a changed day; other reports
+(low-stock) are dropped whenever their tables change.
+
+Invalidation only reaches this worker process, and only when its own job
+worker applied the rollup change; other uvicorn workers and
+`manage.py sales-rollup rebuild` invalidate nothing here. Entries therefore
+always expire: ranges that include today after REPORT_CACHE_TTL, and past
+ranges, which change only when a late order lands or a past order is
+cancelled, after REPORT_CACHE_PAST_TTL (0 keeps them until invalidated,
+for single-process deployments only).
+"""
+import functools
+import math
+from datetime import date, datetime
+from typing import Any, Optional
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from .cache import TTLCache
+from .changes import on_change
+from .reports import parse_date_range
+from .sales import day_range
+
+report_cache = TTLCache("reports", max_entries=256, ttl=settings.REPORT_CACHE_TTL)
+
+
+def _ttl(last_day: Optional[date]) -> Optional[float]:
+    if last_day is not None and last_day <= datetime.utcnow().date():
+        return settings.REPORT_CACHE_PAST_TTL or math.inf
+    return None   # The cache's REPORT_CACHE_TTL
+
+
+def cached_report(report: str, response_model: Any):
+    """
+    Cache a report route's rendered JSON. The key is the report name, the
+    day bounds of its from_date/to_date parameters (if any) and its other
+    query parameters.
+    """
+    adapter = TypeAdapter(response_model)
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            first_day, last_day = day_range(*parse_date_range(kwargs.get("from_date"), kwargs.get("to_date")))
+            params = tuple(sorted(
+                (name, value) for name, value in kwargs.items()
+                if name not in ("from_date", "to_date", "current_user")
+                and not isinstance(value, (Session, AsyncSession, Request))
+            ))
+            key = (report, first_day, last_day, params)
+            body = report_cache.get(key)
+            if body is None:
+                result = adapter.validate_python(fn(*args, **kwargs), from_attributes=True)
+                body = adapter.dump_json(result, by_alias=True)
+                report_cache.set(key, body, len(body), _ttl(last_day))
+            return Response(content=body, media_type="application/json")
+        return wrapper
+    return decorator
+
+
+def _covers(key, day: date) -> bool:
+    _, first_day, last_day, _ = key
+    return (first_day is None or day >= first_day) and (last_day is None or day < last_day)
+
+
+def invalidate_days_on(report: str, *models: type) -> None:
+    """
+    Drop the report's cached ranges that cover a changed day after a commit
+    touching any of the models; their change ids must be ISO dates
+    """
+    @on_change(*models)
+    def _invalidate(model, ids):
+        days = [date.fromisoformat(day) for day in ids if day]
+        report_cache.invalidate_where(report, lambda key: any(_covers(key, day) for day in days))
+    _invalidate.__name__ = f"invalidate_{report}_days"
@@ -0,0 +1,190 @@
+"""
+Shared pieces of the admin reports: date range parsing, period grouping
+expressions evaluated by the database, and streamed order exports.
+"""
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, func, select
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models.order import Order, OrderItem
+
+# Period -> strftime pattern of the bucket label (also used by MySQL DATE_FORMAT)
+PERIOD_FORMATS = {
+    "daily": "%Y-%m-%d",
+    "monthly": "%Y-%m",
+    "yearly": "%Y",
+}
+
+
+def parse_date_range(from_date: Optional[str], to_date: Optional[str]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """
+    Turn the from_date/to_date query parameters into a half-open
+    [start, end) datetime range. A date-only to_date (YYYY-MM-DD) includes
+    that whole day.
+    """
+    def parse(value: str, name: str) -> datetime:
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid {name}, expected YYYY-MM-DD")
+
+    start = parse(from_date, "from_date") if from_date else None
+    end = None
+    if to_date:
+        end = parse(to_date, "to_date")
+        if len(to_date) == 10:
+            end += timedelta(days=1)
+        else:
+            end += timedelta(microseconds=1)
+    return start, end
+
+
+def date_range_filter(column, start: Optional[datetime], end: Optional[datetime]) -> list:
+    conditions = []
+    if start is not None:
+        conditions.append(column >= start)
+    if end is not None:
+        conditions.append(column < end)
+    return conditions
+
+
+def period_label(column, period: str, dialect_name: str):
+    """SQL expression formatting a datetime column as the period's bucket label"""
+    pattern = PERIOD_FORMATS[period]
+    if dialect_name == "mysql":
+        return func.date_format(column, pattern)
+    # SQLite (local development)
+    return func.strftime(pattern, column)
+
+
+# ngram_token_size of the ft_orders_full_name index (MySQL default)
+NGRAM_TOKEN_SIZE = 2
+
+
+def customer_name_filter(db: Session, text: str):
+    """
+    Substring match on Order.full_name. On MySQL a phrase search on the
+    ngram FULLTEXT index narrows the rows first, without scanning the table,
+    and LIKE then keeps the exact matches: the phrase search can over-match,
+    and under-matches if the index was built with stopwords (see
+    add_order_report_indexes.sql). Texts shorter than one n-gram, and other
+    dialects, use ILIKE alone.
+    """
+    text = " ".join(text.split())
+    phrase = text.replace('"', " ").strip()
+    substring = Order.full_name.ilike(f"%{text}%")
+    if db.bind.dialect.name == "mysql" and len(phrase) >= NGRAM_TOKEN_SIZE:
+        return and_(match(Order.full_name, against=f'"{phrase}"').in_boolean_mode(), substring)
+    return substring
+
+
+# Rows fetched from the server-side cursor at a time, and CSV rows per chunk sent
+EXPORT_BATCH_SIZE = 1000
+
+ORDER_EXPORT_COLUMNS = [
+    Order.id, Order.date_order, Order.status_order, Order.status_payment, Order.user_id,
+    Order.full_name, Order.phone, Order.address, Order.city, Order.country, Order.payment_method,
+    Order.sub_total, Order.vat, Order.delivery_fee, Order.total_order,
+]
+ITEM_EXPORT_COLUMNS = [OrderItem.product_id, OrderItem.name, OrderItem.color, OrderItem.quantity, OrderItem.price]
+
+CSV_HEADER = (
+    ["order_id"] + [column.key for column in ORDER_EXPORT_COLUMNS[1:]]
+    + ["item_product_id", "item_name", "item_color", "item_quantity", "item_price", "item_line_total"]
+)
+
+
+def _export_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if hasattr(value, "value"):  # Enum members
+        return value.value
+    return value
+
+
+def _export_rows(start: Optional[datetime], end: Optional[datetime], customer_name: Optional[str]) -> Iterator:
+    """
+    Order/item rows in (date_order, order id) order, read through a
+    server-side cursor. Uses its own session: the request's session is
+    closed before a streamed body is sent.
+    """
+    query = select(*ORDER_EXPORT_COLUMNS, *ITEM_EXPORT_COLUMNS).outerjoin(
+        OrderItem, OrderItem.order_id == Order.id
+    ).where(*date_range_filter(Order.date_order, start, end))
+    query = query.order_by(Order.date_order, Order.id, OrderItem.id)
+
+    db = SessionLocal()
+    try:
+        if customer_name:
+            query = query.where(customer_name_filter(db, customer_name))
+        result = db.execute(query.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE))
+        for partition in result.partitions():
+            yield from partition
+    finally:
+        db.close()
+
+
+def export_orders_csv(start: Optional[datetime], end: Optional[datetime], customer_name: Optional[str] = None) -> Iterator[str]:
+    """CSV, one line per order item (order columns repeated); orders without items get one line"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    yield buffer.getvalue()
+
+    order_width = len(ORDER_EXPORT_COLUMNS)
+    pending = 0
+    buffer.seek(0)
+    buffer.truncate()
+    for row in _export_rows(start, end, customer_name):
+        values = [_export_value(value) for value in row]
+        quantity, price = row[order_width + 3], row[order_width + 4]
+        line_total = quantity * price if quantity is not None and price is not None else None
+        writer.writerow(values + [line_total])
+        pending += 1
+        if pending == EXPORT_BATCH_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending:
+        yield buffer.getvalue()
+
+
+def export_orders_ndjson(start: Optional[datetime], end: Optional[datetime], customer_name: Optional[str] = None) -> Iterator[str]:
+    """NDJSON, one object per order with its items; rows of an order are consecutive"""
+    order_width = len(ORDER_EXPORT_COLUMNS)
+    order_keys = ["id"] + [column.key for column in ORDER_EXPORT_COLUMNS[1:]]
+    item_keys = [column.key for column in ITEM_EXPORT_COLUMNS]
+    current: Optional[Dict[str, Any]] = None
+    items: List[Dict[str, Any]] = []
+    lines: List[str] = []
+
+    def finish() -> None:
+        current["items"] = items
+        lines.append(json.dumps(current, ensure_ascii=False, separators=(",", ":")))
+
+    for row in _export_rows(start, end, customer_name):
+        if current is None or current["id"] != row[0]:
+            if current is not None:
+                finish()
+                if len(lines) >= EXPORT_BATCH_SIZE:
+                    yield "\n".join(lines) + "\n"
+                    lines.clear()
+            current = {key: _export_value(value) for key, value in zip(order_keys, row[:order_width])}
+            items = []
+        if row[order_width] is not None:
+            item = dict(zip(item_keys, row[order_width:]))
+            item["line_total"] = item["quantity"] * item["price"]
+            items.append(item)
+    if current is not None:
+        finish()
+    if lines:
+        yield "\n".join(lines) + "\n"
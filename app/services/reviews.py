@@ -0,0 +1,211 @@
+"""
+Incremental review aggregates on Product.
+
+review_count and rating_sum are adjusted with atomic UPDATE statements in the
+same transaction as the review write, and review_avg is derived from them, so
+a review write costs the same no matter how many reviews the product has.
+The per-star histogram in product_rating_histograms is maintained the same way.
+Review listings are paginated by keyset over (product_id|user_id, column, id) indexes.
+"""
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import asc, case, desc, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models.product import Product
+from ..models.review import Review, ProductRatingHistogram
+from .changes import mark_changed
+from ..utils.pagination import encode_cursor, decode_cursor, keyset_filter
+
+products = Product.__table__
+histograms = ProductRatingHistogram.__table__
+
+STARS = (1, 2, 3, 4, 5)
+
+# Columns review lists can be sorted by; each has a (product_id, column, id) index
+REVIEW_SORT_COLUMNS = {
+    "timestamp": Review.timestamp,
+    "rating": Review.rating,
+}
+# Names used by the frontend
+_REVIEW_SORT_ALIASES = {"created_at": "timestamp", "star": "rating"}
+
+# Floating point sums drift slightly; differences below this are not reported
+RATING_SUM_TOLERANCE = 1e-6
+
+
+def _refresh_average(db: Session, *where) -> None:
+    # Separate statement: MySQL evaluates multi-column SET left to right while
+    # other databases use the old values, so review_avg can't share the UPDATE
+    db.execute(
+        update(products).where(*where).values(
+            review_avg=case((products.c.review_count > 0, products.c.rating_sum / products.c.review_count), else_=0)
+        )
+    )
+
+
+def star_bucket(rating: float) -> int:
+    """Histogram bucket of a rating: rounded half up and clamped to 1-5"""
+    return min(5, max(1, int(rating + 0.5)))
+
+
+def histogram_counts(row: Optional[ProductRatingHistogram]) -> Dict[str, int]:
+    """{"1": n, ..., "5": n} for a histogram row (all zeros if the product has none yet)"""
+    return {str(star): (getattr(row, f"star_{star}") if row is not None else 0) for star in STARS}
+
+
+def _add_to_histogram(db: Session, product_id: str, deltas: Dict[int, int]) -> None:
+    deltas = {star: delta for star, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    increments = {f"star_{star}": histograms.c[f"star_{star}"] + delta for star, delta in deltas.items()}
+    where = histograms.c.product_id == product_id
+    if db.execute(update(histograms).where(where).values(**increments)).rowcount:
+        return
+
+    # First review of the product: create its row. A concurrent first review
+    # may win the insert, in which case the UPDATE now finds the row.
+    initial = {f"star_{star}": max(delta, 0) for star, delta in deltas.items()}
+    try:
+        with db.begin_nested():
+            db.execute(insert(histograms).values(product_id=product_id, **initial))
+    except IntegrityError:
+        db.execute(update(histograms).where(where).values(**increments))
+
+
+def record_review_change(
+    db: Session,
+    product_id: str,
+    old_rating: Optional[float],
+    new_rating: Optional[float],
+) -> None:
+    """
+    Update the product's review aggregates for one review write:
+    create (None, rating), update (old, new) or delete (rating, None).
+    """
+    count_delta = (new_rating is not None) - (old_rating is not None)
+    rating_delta = (new_rating or 0) - (old_rating or 0)
+    db.execute(
+        update(products).where(products.c.id == product_id).values(
+            review_count=products.c.review_count + count_delta,
+            rating_sum=products.c.rating_sum + rating_delta,
+        )
+    )
+    _refresh_average(db, products.c.id == product_id)
+
+    star_deltas: Counter = Counter()
+    if old_rating is not None:
+        star_deltas[star_bucket(old_rating)] -= 1
+    if new_rating is not None:
+        star_deltas[star_bucket(new_rating)] += 1
+    _add_to_histogram(db, product_id, star_deltas)
+
+    mark_changed(db, Product, [product_id])
+
+
+def _review_totals():
+    return select(
+        Review.product_id,
+        func.count(Review.id).label("review_count"),
+        func.coalesce(func.sum(Review.rating), 0).label("rating_sum"),
+    ).group_by(Review.product_id).subquery()
+
+
+def backfill_review_stats(db: Session) -> int:
+    """
+    Recompute review_count, rating_sum, review_avg and the rating histogram of
+    every product from the reviews table
+    """
+    count_subquery = select(func.count(Review.id)).where(Review.product_id == products.c.id).scalar_subquery()
+    sum_subquery = select(func.coalesce(func.sum(Review.rating), 0)).where(Review.product_id == products.c.id).scalar_subquery()
+    result = db.execute(update(products).values(review_count=count_subquery, rating_sum=sum_subquery))
+    _refresh_average(db)
+
+    db.execute(histograms.delete())
+    rows = db.execute(_histogram_totals()).all()
+    if rows:
+        db.execute(insert(histograms), [
+            {"product_id": row.product_id, **{f"star_{star}": getattr(row, f"star_{star}") for star in STARS}}
+            for row in rows
+        ])
+    db.commit()
+    return result.rowcount
+
+
+def _histogram_totals():
+    # Same buckets as star_bucket(): rounded half up, clamped to 1-5
+    bucket = case(*[(Review.rating < star + 0.5, star) for star in STARS[:-1]], else_=STARS[-1])
+    return select(
+        Review.product_id,
+        *[func.sum(case((bucket == star, 1), else_=0)).label(f"star_{star}") for star in STARS],
+    ).group_by(Review.product_id)
+
+
+def find_review_stat_mismatches(db: Session) -> List[Dict]:
+    """Products whose stored aggregates disagree with their reviews"""
+    totals = _review_totals()
+    actual_count = func.coalesce(totals.c.review_count, 0)
+    actual_sum = func.coalesce(totals.c.rating_sum, 0)
+    rows = db.execute(
+        select(products.c.id, products.c.review_count, products.c.rating_sum, actual_count, actual_sum)
+        .outerjoin(totals, totals.c.product_id == products.c.id)
+        .where(
+            (products.c.review_count != actual_count)
+            | (func.abs(products.c.rating_sum - actual_sum) > RATING_SUM_TOLERANCE)
+        )
+    ).all()
+    return [
+        {
+            "product_id": row[0],
+            "stored_count": row[1],
+            "stored_sum": row[2],
+            "actual_count": row[3],
+            "actual_sum": row[4],
+        }
+        for row in rows
+    ]
+
+
+def find_histogram_mismatches(db: Session) -> List[Dict]:
+    """Products whose stored rating histogram disagrees with their reviews"""
+    actual = {row.product_id: histogram_counts(row) for row in db.execute(_histogram_totals()).all()}
+    stored = {row.product_id: histogram_counts(row) for row in db.query(ProductRatingHistogram).all()}
+    empty = histogram_counts(None)
+    return [
+        {"product_id": product_id, "stored": stored.get(product_id, empty), "actual": actual.get(product_id, empty)}
+        for product_id in sorted(set(actual) | set(stored))
+        if stored.get(product_id, empty) != actual.get(product_id, empty)
+    ]
+
+
+def paginate_reviews(query, sort_by: str, order: str, cursor: Optional[str], skip: int = 0) -> Tuple[object, str, str]:
+    """
+    Order a review query (Select or Query) by sort_by then id, and continue
+    after the cursor if one is given, otherwise skip rows (offset mode).
+    Returns (query, sort_by, cursor_key) for next_review_cursor().
+    """
+    sort_by = _REVIEW_SORT_ALIASES.get(sort_by, sort_by)
+    if sort_by not in REVIEW_SORT_COLUMNS:
+        sort_by = "timestamp"
+    sort_column = REVIEW_SORT_COLUMNS[sort_by]
+    descending = order != "asc"
+    direction = desc if descending else asc
+    query = query.order_by(direction(sort_column), direction(Review.id))
+
+    cursor_key = f"reviews:{sort_by}:{'desc' if descending else 'asc'}"
+    if cursor:
+        last_value, last_id = decode_cursor(cursor, cursor_key)
+        query = query.filter(keyset_filter([sort_column, Review.id], [last_value, last_id], descending))
+    elif skip:
+        query = query.offset(skip)
+    return query, sort_by, cursor_key
+
+
+def next_review_cursor(reviews: Sequence[Review], limit: int, sort_by: str, cursor_key: str) -> Optional[str]:
+    """Cursor for the page after `reviews`, or None if it was the last page"""
+    if not reviews or len(reviews) < limit:
+        return None
+    last = reviews[-1]
+    return encode_cursor(cursor_key, [getattr(last, sort_by), last.id])
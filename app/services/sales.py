@@ -0,0 +1,170 @@
+"""
+Daily sales rollups for the revenue and top-products reports.
+
+sales_daily_rollup holds order count, revenue and units sold per day;
+sales_daily_product_rollup holds units and revenue per (day, product).
+Both are kept up to date with deltas: background jobs add new orders and
+subtract cancelled ones, so reports read a few hundred rollup rows instead
+of scanning orders and order items. Cancelled orders are not counted.
+Additions and subtractions commute, so the result doesn't depend on the
+order in which the jobs run. rebuild_sales_rollups() recomputes the
+tables from the orders (python manage.py sales-rollup rebuild).
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models.order import Order, OrderItem, OrderStatus
+from ..models.outbox import OutboxEvent, OutboxStatus
+from ..models.sales import SalesDailyRollup, SalesDailyProductRollup
+from .changes import mark_changed
+
+daily = SalesDailyRollup.__table__
+daily_products = SalesDailyProductRollup.__table__
+
+
+def _add(db: Session, table, key: Dict, deltas: Dict) -> None:
+    # Atomic increment; the first delta of a key inserts its row. A
+    # concurrent insert of the same key makes ours fail, then the UPDATE hits.
+    where = [table.c[name] == value for name, value in key.items()]
+    increments = {name: table.c[name] + delta for name, delta in deltas.items()}
+    if db.execute(update(table).where(*where).values(**increments)).rowcount:
+        return
+    try:
+        with db.begin_nested():
+            db.execute(insert(table).values(**key, **deltas))
+    except IntegrityError:
+        db.execute(update(table).where(*where).values(**increments))
+
+
+def apply_orders_to_rollups(db: Session, order_ids: List[str], sign: int) -> None:
+    """Add (sign=1) or subtract (sign=-1) the given orders from the rollups"""
+    if not order_ids:
+        return
+    orders = db.execute(
+        select(Order.id, Order.date_order, Order.total_order).where(Order.id.in_(order_ids))
+    ).all()
+    day_of = {row.id: row.date_order.date() for row in orders if row.date_order is not None}
+    items = db.execute(
+        select(OrderItem.order_id, OrderItem.product_id, OrderItem.quantity, OrderItem.price)
+        .where(OrderItem.order_id.in_(list(day_of)))
+    ).all() if day_of else []
+
+    days: Dict[date, Dict[str, float]] = defaultdict(lambda: {"order_count": 0, "revenue": 0.0, "units_sold": 0})
+    for row in orders:
+        if row.id in day_of:
+            days[day_of[row.id]]["order_count"] += sign
+            days[day_of[row.id]]["revenue"] += sign * (row.total_order or 0)
+    products: Dict[Tuple[date, str], Dict[str, float]] = defaultdict(lambda: {"units_sold": 0, "revenue": 0.0})
+    for item in items:
+        day = day_of[item.order_id]
+        days[day]["units_sold"] += sign * item.quantity
+        products[(day, item.product_id)]["units_sold"] += sign * item.quantity
+        products[(day, item.product_id)]["revenue"] += sign * item.quantity * item.price
+
+    # Sorted keys: concurrent jobs lock rollup rows in the same order
+    for day in sorted(days):
+        _add(db, daily, {"day": day}, days[day])
+    for day, product_id in sorted(products):
+        _add(db, daily_products, {"day": day, "product_id": product_id}, products[(day, product_id)])
+    # Report caches drop the ranges covering these days
+    mark_changed(db, SalesDailyRollup, [day.isoformat() for day in days])
+    mark_changed(db, SalesDailyProductRollup, {day.isoformat() for day, _ in products})
+
+
+def day_range(start: Optional[datetime], end: Optional[datetime]) -> Tuple[Optional[date], Optional[date]]:
+    """Whole-day [first, last_exclusive) bounds covering a datetime range"""
+    first = start.date() if start is not None else None
+    last = None
+    if end is not None:
+        last = end.date() if end == datetime.combine(end.date(), datetime.min.time()) else end.date() + timedelta(days=1)
+    return first, last
+
+
+def rebuild_sales_rollups(db: Session, first: Optional[date] = None, last: Optional[date] = None) -> int:
+    """
+    Recompute the rollups from orders for days in [first, last) (all days if
+    omitted) and commit. Returns the number of days written.
+
+    Raises RuntimeError while order events are pending or failed: the rebuild
+    would already count their orders, and the events would then be applied a
+    second time. The check is the transaction's first read, so on MySQL the
+    rebuild sees the same snapshot; orders committed later are added by
+    their own events.
+    """
+    from .orders import ORDER_CANCELLED, ORDER_CREATED  # services.orders imports this module
+
+    unapplied = db.scalar(select(func.count(OutboxEvent.id)).where(
+        OutboxEvent.event_type.in_((ORDER_CREATED, ORDER_CANCELLED)),
+        OutboxEvent.status.in_((OutboxStatus.pending.value, OutboxStatus.failed.value)),
+    ))
+    if unapplied:
+        db.rollback()
+        raise RuntimeError(f"{unapplied} order events are pending or failed; process them before rebuilding")
+
+    order_day = func.date(Order.date_order)
+    conditions = [Order.status_order != OrderStatus.cancelled, Order.date_order.isnot(None)]
+    if first is not None:
+        conditions.append(Order.date_order >= datetime.combine(first, datetime.min.time()))
+    if last is not None:
+        conditions.append(Order.date_order < datetime.combine(last, datetime.min.time()))
+
+    for table in (daily, daily_products):
+        delete = table.delete()
+        if first is not None:
+            delete = delete.where(table.c.day >= first)
+        if last is not None:
+            delete = delete.where(table.c.day < last)
+        db.execute(delete)
+
+    # Only the items of orders in the range, not an aggregate over all order_items
+    items_per_order = (
+        select(OrderItem.order_id, func.sum(OrderItem.quantity).label("quantity"))
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(*conditions)
+        .group_by(OrderItem.order_id)
+        .subquery()
+    )
+    day_rows = db.execute(
+        select(
+            order_day.label("day"),
+            func.count(Order.id),
+            func.coalesce(func.sum(Order.total_order), 0),
+            func.coalesce(func.sum(items_per_order.c.quantity), 0),
+        )
+        .outerjoin(items_per_order, items_per_order.c.order_id == Order.id)
+        .where(*conditions)
+        .group_by(order_day)
+    ).all()
+    product_rows = db.execute(
+        select(
+            order_day.label("day"),
+            OrderItem.product_id,
+            func.sum(OrderItem.quantity),
+            func.sum(OrderItem.quantity * OrderItem.price),
+        )
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(*conditions)
+        .group_by(order_day, OrderItem.product_id)
+    ).all()
+
+    def as_date(value):
+        # SQLite returns DATE() as a string
+        return date.fromisoformat(value) if isinstance(value, str) else value
+
+    if day_rows:
+        db.execute(insert(daily), [
+            {"day": as_date(day), "order_count": count, "revenue": revenue, "units_sold": units}
+            for day, count, revenue, units in day_rows
+        ])
+    if product_rows:
+        db.execute(insert(daily_products), [
+            {"day": as_date(day), "product_id": product_id, "units_sold": units, "revenue": revenue}
+            for day, product_id, units, revenue in product_rows
+        ])
+    db.commit()
+    return len(day_rows)
@@ -0,0 +1,67 @@
+import re
+import unicodedata
+from typing import List, Tuple, Union
+
+from sqlalchemy import and_, or_, case, literal
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..models.product import Product
+
+# Tokens shorter than this match too much as prefixes to be useful
+MIN_TOKEN_LENGTH = 2
+MAX_TOKENS = 8
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize_tokens(text: str) -> List[str]:
+    """
+    Split a search string into lowercase word tokens.
+    Boolean-mode operators (+ - * " ~ < > ( )) are dropped so user input
+    can never change the meaning of the FULLTEXT query.
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    tokens = []
+    for token in _TOKEN_RE.findall(text):
+        token = token.strip("_")
+        if len(token) >= MIN_TOKEN_LENGTH and token not in tokens:
+            tokens.append(token)
+    return tokens[:MAX_TOKENS]
+
+
+def to_boolean_query(tokens: List[str]) -> str:
+    """Every token is required and matched as a prefix: 'sofa woo' -> '+sofa* +woo*'"""
+    return " ".join(f"+{token}*" for token in tokens)
+
+
+def product_search(db: Union[Session, AsyncSession], text: str) -> Tuple[object, object]:
+    """
+    Build the (filter, relevance) pair for a product search.
+
+    On MySQL this uses the FULLTEXT indexes on products; name matches are
+    weighted above title/description matches. Other dialects (e.g. SQLite
+    for local development) fall back to LIKE matching.
+    Text without tokens of MIN_TOKEN_LENGTH (e.g. "a") is matched against
+    the name with LIKE as before, unranked: relevance is None.
+    """
+    tokens = normalize_tokens(text)
+    if not tokens:
+        return Product.name.ilike(f"%{text.strip()}%"), None
+
+    if db.bind.dialect.name == "mysql":
+        against = to_boolean_query(tokens)
+        name_score = match(Product.name, against=against).in_boolean_mode()
+        full_score = match(Product.name, Product.title, Product.description, against=against).in_boolean_mode()
+        return full_score, name_score * 2 + full_score
+
+    columns = (Product.name, Product.title, Product.description)
+    condition = and_(*[
+        or_(*[column.ilike(f"%{token}%") for column in columns])
+        for token in tokens
+    ])
+    score = literal(0)
+    for token in tokens:
+        score = score + case((Product.name.ilike(f"{token}%"), 2), (Product.name.ilike(f"%{token}%"), 1), else_=0)
+    return condition, score
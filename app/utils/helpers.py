@@ -1,7 +1,157 @@
-import uuid
+import atexit
+import os
+import threading
+import time
+from typing import Optional
+
+from ..config import settings
+from ..database import SessionLocal
+from ..services import id_leases
+
+# Snowflake-style ids: 42 bits of milliseconds since ID_EPOCH_MS, 10 bits of
+# worker id and a 12 bit per-millisecond sequence, written as 13 Crockford
+# base32 characters. Ids of one prefix sort by creation time, and within a
+# millisecond by generation order in one process, so new rows are appended
+# at the end of the clustered index instead of at random pages. Each process
+# leases its worker id from the database (services.id_leases), so no two
+# running processes share one.
+ID_EPOCH_MS = 1704067200000  # 2024-01-01 UTC
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+ID_LENGTH = 13
+
+_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"  # Crockford base32
+_MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+
+class IdGenerator:
+    """
+    Ids for one process. With worker_id=None the worker id is leased from the
+    database by reserve() (or on first use) and renewed in the background every
+    quarter of ID_WORKER_LEASE_TTL. Once half of it has passed without a
+    renewal, the next id renews first, so none is generated on a lease that
+    might have expired.
+    """
+
+    def __init__(self, worker_id: Optional[int] = None):
+        self.worker_id = worker_id
+        self._leased = worker_id is None
+        self._owner: Optional[str] = None
+        self._leased_at = 0.0   # time.monotonic() of the last lease or renewal
+        self._lock = threading.Lock()
+        self._renewer: Optional[threading.Thread] = None
+        self._stop_renewing = threading.Event()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def _ensure_lease(self, renew_after: float = 0.5) -> None:
+        """Lease a worker id, or renew ours once renew_after x ID_WORKER_LEASE_TTL has passed"""
+        ttl = settings.ID_WORKER_LEASE_TTL
+        if not self._leased or (self.worker_id is not None and time.monotonic() < self._leased_at + ttl * renew_after):
+            return
+        started = time.monotonic()
+        db = SessionLocal()
+        try:
+            if self.worker_id is not None and id_leases.renew_worker_id(db, self.worker_id, self._owner, ttl) is None:
+                self.worker_id = None   # Expired and taken over meanwhile
+            if self.worker_id is None:
+                self._owner = self._owner or id_leases.lease_owner()
+                self.worker_id = id_leases.lease_worker_id(db, self._owner, ttl, 1 << WORKER_BITS)
+        finally:
+            db.close()
+        self._leased_at = started
+
+    def _renew_periodically(self) -> None:
+        while not self._stop_renewing.wait(settings.ID_WORKER_LEASE_TTL / 4):
+            try:
+                with self._lock:
+                    self._ensure_lease(renew_after=0.25)
+            except Exception:
+                pass   # Retried next round; past half the TTL the next id renews inline
+
+    def reserve(self) -> int:
+        """Lease the worker id now rather than on the first id and keep it renewed; returns it"""
+        with self._lock:
+            self._ensure_lease()
+            if self._leased and self._renewer is None:
+                self._stop_renewing.clear()
+                self._renewer = threading.Thread(target=self._renew_periodically, name="id-lease-renewer", daemon=True)
+                self._renewer.start()
+            return self.worker_id
+
+    def release(self) -> None:
+        """Give the leased worker id back; the next id leases one again"""
+        self._stop_renewing.set()
+        self._renewer = None
+        with self._lock:
+            if not self._leased or self.worker_id is None:
+                return
+            db = SessionLocal()
+            try:
+                id_leases.release_worker_id(db, self.worker_id, self._owner)
+            finally:
+                db.close()
+            self.worker_id = None
+
+    def next_int(self) -> int:
+        with self._lock:
+            self._ensure_lease()
+            now = time.time_ns() // 1_000_000 - ID_EPOCH_MS
+            if now < self._last_ms:
+                now = self._last_ms  # Clock moved back: keep counting in the last millisecond
+            if now == self._last_ms:
+                self._sequence = (self._sequence + 1) & _MAX_SEQUENCE
+                if self._sequence == 0:
+                    # Sequence exhausted: continue in the next millisecond
+                    now = self._last_ms + 1
+                    while time.time_ns() // 1_000_000 - ID_EPOCH_MS < now:
+                        time.sleep(0.0001)
+            else:
+                self._sequence = 0
+            self._last_ms = now
+            return (now << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | self._sequence
+
+    def next_id(self) -> str:
+        value = self.next_int()
+        chars = []
+        for _ in range(ID_LENGTH):
+            chars.append(_ALPHABET[value & 31])
+            value >>= 5
+        return "".join(reversed(chars))
+
+
+_generator = IdGenerator()
+
+
+def _reset_generator() -> None:
+    # A forked child must not use its parent's lease: it leases its own worker id
+    global _generator
+    _generator = IdGenerator()
+
+
+os.register_at_fork(after_in_child=_reset_generator)
+
+
+def reserve_worker_id() -> int:
+    """Lease this process' worker id up front, so a failure shows at startup"""
+    return _generator.reserve()
+
+
+def release_worker_id() -> None:
+    """Free this process' worker id for the next process"""
+    _generator.release()
+
+
+@atexit.register
+def _release_at_exit() -> None:
+    # Scripts (init_db.py, manage.py) that generated ids free theirs on exit
+    try:
+        _generator.release()
+    except Exception:
+        pass   # The lease expires after ID_WORKER_LEASE_TTL anyway
 
 
 def generate_id(prefix: str = "") -> str:
-    """Generate unique ID with optional prefix"""
-    unique_id = str(uuid.uuid4())[:8].upper()
+    """Generate a unique, time-ordered ID with optional prefix (e.g. ORD01HX3K9Q2M7ZB)"""
+    unique_id = _generator.next_id()
     return f"{prefix}{unique_id}" if prefix else unique_id
@@ -0,0 +1,45 @@
+import hashlib
+from typing import Any, Dict
+
+from fastapi import Request, Response
+from sqlalchemy import inspect as sa_inspect
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag for a response body"""
+    return f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+def row_etag(*objs: Any) -> str:
+    """
+    Strong ETag from the column values of ORM rows. Cheaper than hashing the
+    rendered response because nothing has to be serialized to compute it.
+    A None (e.g. an optional side row that doesn't exist yet) still counts
+    as a position, so it can't be confused with a present row.
+    """
+    digest = hashlib.sha1()
+    for obj in objs:
+        if obj is None:
+            digest.update(b"\x1e")
+            continue
+        state = sa_inspect(obj)
+        for attr in state.mapper.column_attrs:
+            digest.update(repr(state.attrs[attr.key].value).encode())
+            digest.update(b"\x1f")
+        digest.update(b"\x1e")
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match uses weak comparison: W/ prefixes are ignored"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    return Response(status_code=304, headers=headers)
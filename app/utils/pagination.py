@@ -0,0 +1,78 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import and_, false, or_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if hasattr(value, "value"):  # Enum members
+        return value.value
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(key: str, values: Sequence[Any]) -> str:
+    """Build an opaque cursor from the sort key name and the last row's sort values"""
+    payload = json.dumps([key, [_encode_value(v) for v in values]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key: str, length: int = 2) -> List[Any]:
+    """
+    Decode a cursor produced by encode_cursor, checking it was issued for the
+    same sort key and holds `length` sort values
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_key, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if cursor_key != key or not isinstance(values, list):
+        raise HTTPException(status_code=400, detail="Cursor does not match the requested sort order")
+    if len(values) != length:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return [_decode_value(v) for v in values]
+
+
+def _equal(column: Any, value: Any):
+    return column.is_(None) if value is None else column == value
+
+
+def _after(column: Any, value: Any, descending: bool):
+    # MySQL and SQLite sort NULLs first ascending and last descending
+    nullable = getattr(column, "nullable", True)
+    if value is None:
+        return false() if descending else column.isnot(None)
+    if descending:
+        return or_(column < value, column.is_(None)) if nullable else column < value
+    return column > value
+
+
+def keyset_filter(columns: Sequence[Any], values: Sequence[Any], descending: bool):
+    """
+    Row-value comparison (c1, c2, ...) < (v1, v2, ...) spelled out as OR/AND
+    so MySQL can drive it from the matching composite index. NULL sort
+    values are placed where the database's ORDER BY puts them, so a page
+    ending on a NULL doesn't cut off the rest.
+    """
+    if len(columns) != len(values):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    clauses = []
+    for i, column in enumerate(columns):
+        equal_prefix = [_equal(columns[j], values[j]) for j in range(i)]
+        clauses.append(and_(*equal_prefix, _after(column, values[i], descending)))
+    return or_(*clauses)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Analytics query latency over synthetic order lines
+Run: python benchmarks/bench_analytics.py [--lines 10000000] [--repeat 5]
+
+Fills an AnalyticsStore with random lines (no database needed) and times
+run_query() for every dimension, single-threaded.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.services.analytics import DIMENSIONS, TEXT_DIMENSIONS, AnalyticsStore, run_query  # noqa: E402
+
+CARDINALITY = {"category": 50, "product": 20000, "city": 60, "country": 5, "payment_method": 4}
+LINES_PER_ORDER = 3
+
+
+def fill(store: AnalyticsStore, lines: int, seed: int = 0) -> None:
+    rng = np.random.default_rng(seed)
+    orders = lines // LINES_PER_ORDER + 1
+    order = np.arange(lines, dtype=np.int32) // LINES_PER_ORDER
+    start = int(datetime(2022, 1, 1).timestamp())
+    order_ts = start + rng.integers(0, 3 * 365 * 86400, orders, dtype=np.int64)
+    for name, size in CARDINALITY.items():
+        store.dictionaries[name].encode([f"{name}-{i}" for i in range(size)])
+    quantity = rng.integers(1, 5, lines).astype(np.float64)
+    columns = {
+        "ts": order_ts[order],
+        "order": order,
+        "quantity": quantity,
+        "revenue": quantity * rng.uniform(10, 2000, lines),
+        **{name: rng.integers(0, CARDINALITY[name], lines, dtype=np.int32) for name in TEXT_DIMENSIONS},
+    }
+    for name in ("city", "country", "payment_method"):
+        columns[name] = columns[name][order - order % LINES_PER_ORDER]  # Same for every line of an order
+    store.append_columns([f"ORD{i}" for i in range(orders)], columns)
+    store.publish()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=10_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    settings.ANALYTICS_REFRESH_INTERVAL = float("inf")   # Never reach for the database
+
+    store = AnalyticsStore()
+    started = time.perf_counter()
+    fill(store, args.lines)
+    print(f"filled {args.lines} lines in {time.perf_counter() - started:.1f}s, {store.stats()['bytes'] / 2**20:.0f} MiB")
+
+    cases = [(dimension, ["revenue", "units", "lines"], None) for dimension in DIMENSIONS]
+    cases += [(dimension, ["revenue", "orders"], None) for dimension in DIMENSIONS]
+    cases.append(("city", ["revenue"], (datetime(2023, 1, 1), datetime(2023, 7, 1))))
+    print(f"{'dimension':>15} {'metrics':>20} {'range':>6} {'p50 ms':>9} {'max ms':>9}")
+    for dimension, metrics, date_range in cases:
+        start, end = date_range or (None, None)
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            run_query(dimension, metrics, limit=20, start=start, end=end, store=store)
+            timings.append((time.perf_counter() - started) * 1000)
+        print(f"{dimension:>15} {','.join(metrics):>20} {'yes' if date_range else 'no':>6} "
+              f"{statistics.median(timings):>9.1f} {max(timings):>9.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
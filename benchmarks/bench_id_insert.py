@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Insert throughput: time-ordered ids (generate_id) versus truncated uuid4
+Run: python benchmarks/bench_id_insert.py [--rows 200000] [--batch 1000]
+
+Inserts the same number of rows into two scratch tables that differ only in
+how the String primary key is generated, then drops them. Use the MySQL
+database from DATABASE_URL: the difference comes from InnoDB's clustered
+index (random keys split pages all over the tree, sequential keys append),
+and it grows once the table no longer fits in the buffer pool.
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import Column, MetaData, String, Table, Text, insert  # noqa: E402
+
+from app.database import engine  # noqa: E402
+from app.utils.helpers import generate_id  # noqa: E402
+
+
+def uuid_id(prefix: str) -> str:
+    # The previous generate_id()
+    return f"{prefix}{str(uuid.uuid4())[:8].upper()}"
+
+
+SCHEMES = {
+    "uuid4[:8]": uuid_id,
+    "time-ordered": generate_id,
+}
+
+
+def run(table: Table, make_id, rows: int, batch: int):
+    """Returns (seconds, collisions); colliding ids are regenerated before the INSERT"""
+    payload = "x" * 200
+    seen = set()
+    collisions = 0
+
+    def unique_id():
+        nonlocal collisions
+        while True:
+            new_id = make_id("ORD")
+            if new_id not in seen:
+                seen.add(new_id)
+                return new_id
+            collisions += 1
+
+    elapsed = 0.0
+    with engine.connect() as conn:
+        for start in range(0, rows, batch):
+            rows_batch = [{"id": unique_id(), "payload": payload} for _ in range(min(batch, rows - start))]
+            started = time.perf_counter()
+            conn.execute(insert(table), rows_batch)
+            conn.commit()
+            elapsed += time.perf_counter() - started
+    return elapsed, collisions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--batch", type=int, default=1000, help="Rows per INSERT transaction")
+    args = parser.parse_args()
+
+    metadata = MetaData()
+    tables = {
+        name: Table(
+            f"bench_ids_{i}", metadata,
+            Column("id", String(50), primary_key=True),
+            Column("payload", Text),
+        )
+        for i, name in enumerate(SCHEMES)
+    }
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    try:
+        print(f"{'scheme':>14} {'rows':>9} {'seconds':>9} {'rows/s':>10} {'collisions':>11}")
+        for name, make_id in SCHEMES.items():
+            elapsed, collisions = run(tables[name], make_id, args.rows, args.batch)
+            print(f"{name:>14} {args.rows:>9} {elapsed:>9.2f} {args.rows / elapsed:>10.0f} {collisions:>11}")
+    finally:
+        metadata.drop_all(engine)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Order creation latency versus cart size
+Run: python benchmarks/bench_order_create.py [--sizes 1,5,10,25,50,100] [--repeat 20]
+
+Uses the database from DATABASE_URL. The benchmark creates its own user and
+products (ids prefixed with BENCH) and deletes them, with the orders it
+placed, when it finishes.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal  # noqa: E402
+from app.models import (  # noqa: E402,F401
+    user, product, category, banner, cart, favorite, order, review,
+    country, filter, supplier, inventory, outbox, sales
+)
+from app.models.order import Order, OrderItem  # noqa: E402
+from app.models.product import Product  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.routers.orders import create_order  # noqa: E402
+from app.schemas.order import OrderCreate  # noqa: E402
+
+PREFIX = "BENCH"
+USER_ID = f"{PREFIX}U1"
+
+
+def setup(db, product_count: int) -> None:
+    db.add(User(id=USER_ID, email="bench@example.com", password_hash="x", full_name="Bench"))
+    for i in range(product_count):
+        db.add(Product(
+            id=f"{PREFIX}P{i:04d}", name=f"Bench product {i}", status="active",
+            root_price=100, current_price=90, review_avg=0, sell_count=0,
+        ))
+    db.commit()
+
+
+def teardown(db) -> None:
+    order_ids = [o.id for o in db.query(Order.id).filter(Order.user_id == USER_ID)]
+    if order_ids:
+        db.query(OrderItem).filter(OrderItem.order_id.in_(order_ids)).delete(synchronize_session=False)
+        db.query(Order).filter(Order.id.in_(order_ids)).delete(synchronize_session=False)
+    db.query(Product).filter(Product.id.like(f"{PREFIX}P%")).delete(synchronize_session=False)
+    db.query(User).filter(User.id == USER_ID).delete(synchronize_session=False)
+    db.commit()
+
+
+def order_payload(size: int) -> OrderCreate:
+    items = [
+        {"product_id": f"{PREFIX}P{i:04d}", "name": f"Bench product {i}", "quantity": 1, "price": 90}
+        for i in range(size)
+    ]
+    return OrderCreate(
+        full_name="Bench", phone="0", country="VN", city="HCM", address="-",
+        payment_method="cod", sub_total=90 * size, total_order=90 * size, items=items,
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1,5,10,25,50,100", help="Comma-separated cart sizes")
+    parser.add_argument("--repeat", type=int, default=20, help="Orders placed per cart size")
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    db = SessionLocal()
+    try:
+        teardown(db)
+        setup(db, max(sizes))
+        current_user = db.get(User, USER_ID)
+
+        print(f"{'items':>6} {'p50 ms':>9} {'p95 ms':>9} {'ms/item':>9}")
+        for size in sizes:
+            payload = order_payload(size)
+            create_order(payload, current_user, db)  # warm-up
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                create_order(payload, current_user, db)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            p50 = statistics.median(timings)
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            print(f"{size:>6} {p50:>9.2f} {p95:>9.2f} {p50 / size:>9.3f}")
+    finally:
+        teardown(db)
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
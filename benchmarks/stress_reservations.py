@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Concurrent checkout stress test for stock reservations
+Run: python benchmarks/stress_reservations.py [--stock 50] [--workers 16] [--orders 200]
+
+Many threads place orders for the same product at once against DATABASE_URL
+(use MySQL: SQLite serializes writers). Exactly `stock` units must be
+reserved, the rest of the orders must be rejected with 409, and the inventory
+row must match the order items. Test data (ids prefixed with STRESS) is
+deleted at the end.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import HTTPException  # noqa: E402
+from sqlalchemy import func  # noqa: E402
+
+from app.database import SessionLocal  # noqa: E402
+from app.models import (  # noqa: E402,F401
+    user, product, category, banner, cart, favorite, order, review,
+    country, filter, supplier, inventory, outbox, sales
+)
+from app.models.inventory import Inventory  # noqa: E402
+from app.models.order import Order, OrderItem  # noqa: E402
+from app.models.product import Product  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.routers.orders import create_order  # noqa: E402
+from app.schemas.order import OrderCreate  # noqa: E402
+
+PREFIX = "STRESS"
+USER_ID = f"{PREFIX}U1"
+PRODUCT_ID = f"{PREFIX}P1"
+
+
+def setup(db, stock: int) -> None:
+    db.add(User(id=USER_ID, email="stress@example.com", password_hash="x", full_name="Stress"))
+    db.add(Product(id=PRODUCT_ID, name="Stress product", status="active",
+                   root_price=100, current_price=90, review_avg=0, sell_count=0))
+    db.flush()
+    db.add(Inventory(id=f"{PREFIX}INV1", product_id=PRODUCT_ID, quantity_on_hand=stock, quantity_reserved=0))
+    db.commit()
+
+
+def teardown(db) -> None:
+    order_ids = [o.id for o in db.query(Order.id).filter(Order.user_id == USER_ID)]
+    if order_ids:
+        db.query(OrderItem).filter(OrderItem.order_id.in_(order_ids)).delete(synchronize_session=False)
+        db.query(Order).filter(Order.id.in_(order_ids)).delete(synchronize_session=False)
+    db.query(Inventory).filter(Inventory.product_id == PRODUCT_ID).delete(synchronize_session=False)
+    db.query(Product).filter(Product.id == PRODUCT_ID).delete(synchronize_session=False)
+    db.query(User).filter(User.id == USER_ID).delete(synchronize_session=False)
+    db.commit()
+
+
+def place_order(outcomes: Counter, lock: threading.Lock) -> None:
+    payload = OrderCreate(
+        full_name="Stress", phone="0", country="VN", city="HCM", address="-",
+        payment_method="cod", sub_total=90, total_order=90,
+        items=[{"product_id": PRODUCT_ID, "name": "Stress product", "quantity": 1, "price": 90}],
+    )
+    db = SessionLocal()
+    try:
+        create_order(payload, db.get(User, USER_ID), db)
+        outcome = "ok"
+    except HTTPException as e:
+        db.rollback()
+        outcome = str(e.status_code)
+    except Exception as e:  # deadlocks etc. count as failures, not oversells
+        db.rollback()
+        outcome = type(e).__name__
+    finally:
+        db.close()
+    with lock:
+        outcomes[outcome] += 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--stock", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--orders", type=int, default=200)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    teardown(db)
+    setup(db, args.stock)
+    try:
+        outcomes: Counter = Counter()
+        lock = threading.Lock()
+        remaining = iter(range(args.orders))
+        remaining_lock = threading.Lock()
+
+        def worker():
+            while True:
+                with remaining_lock:
+                    if next(remaining, None) is None:
+                        return
+                place_order(outcomes, lock)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(args.workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        db.expire_all()
+        inv = db.query(Inventory).filter(Inventory.product_id == PRODUCT_ID).one()
+        sold = db.query(func.coalesce(func.sum(OrderItem.reserved_quantity), 0)).join(Order).filter(
+            Order.user_id == USER_ID
+        ).scalar()
+        print(f"{args.orders} orders, {args.workers} workers, {elapsed:.2f}s: {dict(outcomes)}")
+        print(f"stock={args.stock} reserved={inv.quantity_reserved} reserved by order items={sold}")
+
+        failures = []
+        if inv.quantity_reserved > inv.quantity_on_hand:
+            failures.append("oversold: reserved more than on hand")
+        if inv.quantity_reserved != sold:
+            failures.append("inventory and order items disagree")
+        if outcomes["ok"] != inv.quantity_reserved:
+            failures.append("accepted orders don't match reservations")
+        if args.orders >= args.stock and inv.quantity_reserved != args.stock:
+            failures.append("stock left unsold")
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        if not failures:
+            print("OK: no oversell")
+        return 1 if failures else 0
+    finally:
+        teardown(db)
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -16,6 +16,10 @@ from app.models.country import Country
 from app.models.filter import Filter
 from app.models.supplier import Supplier
 from app.models.inventory import Inventory, InventoryTransaction
+from app.models.outbox import OutboxEvent
+from app.models.sales import SalesDailyRollup, SalesDailyProductRollup
+from app.models.id_lease import IdWorkerLease
+from app.models.idempotency import IdempotencyKey
 from app.utils.security import get_password_hash
 from app.utils.helpers import generate_id
 from datetime import datetime
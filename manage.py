@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Maintenance commands
+Run: python manage.py <command> [options]
+
+  review-stats backfill   Recompute review_count / rating_sum / review_avg and rating histograms
+  review-stats check      List products whose review aggregates or histograms disagree with their reviews
+  jobs status             Background job queue depth, lag and failures
+  jobs run                Process all due background jobs now (without the web workers)
+  jobs retry-failed       Queue failed jobs again
+  jobs purge [--days N]   Delete processed jobs older than N days (default 7)
+  sales-rollup rebuild [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+                          Recompute the daily sales rollups from orders (to is inclusive)
+                          after applying queued order events; refuses while some are failed
+"""
+import argparse
+import sys
+from datetime import date, timedelta
+
+from app.database import SessionLocal
+# Import every model so relationships between them can be configured
+from app.models import (  # noqa: F401
+    user, product, category, banner, cart, favorite, order, review,
+    country, filter, supplier, inventory, outbox, sales
+)
+from app.services import orders as _order_jobs  # noqa: F401  (registers job handlers)
+from app.services.jobs import process_pending, purge_processed, queue_status, retry_failed
+from app.services.sales import rebuild_sales_rollups
+from app.services.reviews import (
+    backfill_review_stats, find_review_stat_mismatches, find_histogram_mismatches
+)
+
+
+def review_stats(args) -> int:
+    db = SessionLocal()
+    try:
+        if args.action == "backfill":
+            updated = backfill_review_stats(db)
+            print(f"Review aggregates recomputed for {updated} products")
+            return 0
+
+        mismatches = find_review_stat_mismatches(db)
+        for m in mismatches:
+            print(
+                f"{m['product_id']}: stored count={m['stored_count']} sum={m['stored_sum']}, "
+                f"actual count={m['actual_count']} sum={m['actual_sum']}"
+            )
+        histogram_mismatches = find_histogram_mismatches(db)
+        for m in histogram_mismatches:
+            print(f"{m['product_id']}: stored histogram={m['stored']}, actual histogram={m['actual']}")
+        print(f"{len(mismatches)} inconsistent products, {len(histogram_mismatches)} inconsistent histograms")
+        return 1 if mismatches or histogram_mismatches else 0
+    finally:
+        db.close()
+
+
+def jobs(args) -> int:
+    if args.action == "run":
+        total = 0
+        while True:
+            processed = process_pending()
+            if not processed:
+                break
+            total += processed
+        print(f"{total} jobs processed")
+        return 0
+
+    db = SessionLocal()
+    try:
+        if args.action == "retry-failed":
+            print(f"{retry_failed(db)} failed jobs queued again")
+        elif args.action == "purge":
+            print(f"{purge_processed(db, timedelta(days=args.days))} processed jobs deleted")
+        else:
+            status = queue_status(db)
+            print(f"depth={status['depth']} failed={status['failed']} lag={status['lag_seconds']:.1f}s")
+        return 0
+    finally:
+        db.close()
+
+
+def sales_rollup(args) -> int:
+    first = date.fromisoformat(args.from_date) if args.from_date else None
+    last = date.fromisoformat(args.to_date) + timedelta(days=1) if args.to_date else None
+    # Apply queued order events first, so the rebuild doesn't count them twice
+    while process_pending():
+        pass
+    db = SessionLocal()
+    try:
+        days = rebuild_sales_rollups(db, first, last)
+        print(f"Sales rollups rebuilt for {days} days")
+        return 0
+    except RuntimeError as e:
+        print(f"{e} (see `python manage.py jobs status`)")
+        return 1
+    finally:
+        db.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Furniture Store maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    review_parser = commands.add_parser("review-stats", help="Product review aggregates")
+    review_parser.add_argument("action", choices=["backfill", "check"])
+    review_parser.set_defaults(handler=review_stats)
+
+    jobs_parser = commands.add_parser("jobs", help="Background job queue (outbox)")
+    jobs_parser.add_argument("action", choices=["status", "run", "retry-failed", "purge"])
+    jobs_parser.add_argument("--days", type=int, default=7, help="purge: keep processed jobs this many days")
+    jobs_parser.set_defaults(handler=jobs)
+
+    rollup_parser = commands.add_parser("sales-rollup", help="Daily sales rollups used by the reports")
+    rollup_parser.add_argument("action", choices=["rebuild"])
+    rollup_parser.add_argument("--from", dest="from_date", help="First day to rebuild (YYYY-MM-DD)")
+    rollup_parser.add_argument("--to", dest="to_date", help="Last day to rebuild, inclusive (YYYY-MM-DD)")
+    rollup_parser.set_defaults(handler=sales_rollup)
+
+    args = parser.parse_args()
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())